@@ -1,6 +1,5 @@
 from flask import Flask
 from flask_cors import CORS
-import osmnx as ox
 from dotenv import load_dotenv
 from flasgger import Swagger
 import os
@@ -10,10 +9,10 @@ from src.routes.car_trips_routes import car_trips_route
 from src.routes.bus_routes import bus_route
 from src.routes.flood_events_routes import flood_events_route
 from src.routes.traffic_routes import traffic_route
+from src.routes.system_routes import system_route
 from src.utils.onemap_auth import get_valid_token, refresh_onemap_token
 from apscheduler.schedulers.background import BackgroundScheduler
 
-G = ox.load_graphml("SG_bus_network.graphml")
 def create_app():
     
     app = Flask(__name__,template_folder="src/templates")
@@ -29,6 +28,7 @@ def create_app():
     app.register_blueprint(flood_events_route)
     app.register_blueprint(traffic_route)
     app.register_blueprint(critical_roads_route)
+    app.register_blueprint(system_route)
     CORS(app, origins=["https://data-alchemists-fyp-2025.onrender.com"])
     scheduler = BackgroundScheduler()
     scheduler.add_job(refresh_onemap_token, 'interval', days=2)
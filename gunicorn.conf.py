@@ -0,0 +1,27 @@
+# Gunicorn picks this file up automatically when started from the repository root.
+#
+# Preload mode (PRELOAD_STATIC_DATA=1): the app and all static data (graphs, centrality
+# maps, GTFS stops/shapes, flood CSV) are built once in the master and shared with the
+# forked workers copy-on-write. Each worker logs its shared vs private memory on start,
+# and GET /system/memory reports it for whichever worker serves the request.
+import os
+
+from src.utils.preload import memory_report, preload_static_data, warm_route_data
+from src.utils.route_worker import start_route_pool
+
+preload_app = os.getenv("PRELOAD_STATIC_DATA", "0") == "1"
+
+
+def when_ready(server):
+    # Runs in the master before the first worker is forked
+    if preload_app:
+        preload_static_data()
+
+
+def post_fork(server, worker):
+    # Fork the route pool while the worker is still single-threaded, not from a request thread
+    start_route_pool(warm_up=warm_route_data)
+
+
+def post_worker_init(worker):
+    print(f"Worker memory at start: {memory_report()}")
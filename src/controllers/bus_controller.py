@@ -1,12 +1,11 @@
 from src.database import supabase
 from flask import jsonify, request, Blueprint
-import os
 import requests
 import json
-import googlemaps
 from datetime import datetime
 from dotenv import load_dotenv
 from src.utils.onemap_auth import get_valid_token
+from src.utils.geocoding import geocode_addresses
 import pandas as pd
 from pathlib import Path
 
@@ -15,7 +14,6 @@ load_dotenv()
 ROOT_DIR = Path(__file__).resolve().parents[2]
 one_map_route = Blueprint('one_map_route', __name__)
 ONEMAP_BASE_URL = "https://www.onemap.gov.sg/api/public/routingsvc/route"
-gmaps = googlemaps.Client(os.getenv("GOOGLE_MAPS_API_KEY"))
 shapes_df = pd.read_csv(ROOT_DIR/"shapes.txt")
 bus_route = Blueprint('bus_route', __name__)
 
@@ -37,17 +35,22 @@ def get_onemap_route():
     if not start_address or not end_address:
         return jsonify({"error": "start_address and end_address are required"}), 400
 
-    start_location = gmaps.geocode(start_address)
+    # Both addresses in one round trip
+    geocoded = geocode_addresses([start_address, end_address])
+    if start_address not in geocoded or end_address not in geocoded:
+        return jsonify({"error": "Geocoding timed out"}), 504
+
+    start_location = geocoded[start_address]
     if not start_location:
         return jsonify({"error": "Start address not found"}), 404
-    start_lat_raw = start_location[0]['geometry']['location']['lat']
-    start_lon_raw = start_location[0]['geometry']['location']['lng']
+    start_lat_raw = start_location['lat']
+    start_lon_raw = start_location['lon']
 
-    end_location = gmaps.geocode(end_address)
+    end_location = geocoded[end_address]
     if not end_location:
         return jsonify({"error": "End address not found"}), 404
-    end_lat_raw = end_location[0]['geometry']['location']['lat']
-    end_lon_raw = end_location[0]['geometry']['location']['lng']
+    end_lat_raw = end_location['lat']
+    end_lon_raw = end_location['lon']
 
     start_lat = start_lat_raw
     start_lon = start_lon_raw
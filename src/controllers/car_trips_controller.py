@@ -1,17 +1,23 @@
 from src.database import supabase
-from flask import jsonify, request, Blueprint
-import googlemaps
+from flask import jsonify, request, Blueprint, send_file
 import requests
 from datetime import datetime
-import os
+import io
+import time
 from dotenv import load_dotenv
 from src.utils.onemap_auth import get_valid_token
-import osmnx as ox
-from shapely import wkb
-import geopandas as gpd
-import pandas as pd
+from src.utils.graph_registry import get_compact_graph, get_graph
+from src.utils.flood_exposure import FLOOD_PENALTY_FACTOR, flood_dataset_version, get_flood_edge_mask, get_flood_exposure
+from src.utils.routing import ENGINES, incremental_detour, one_to_many, reverse_dijkstra, shortest_path, tree_path
+from src.utils.contraction_hierarchy import get_contraction_hierarchy
+from src.utils.travel_time import NORMAL_SPEED, SPEED_LABELS, SPEEDS_MPS, by_speed, flood_travel_times, route_delays
+from src.utils.od_matrix import od_matrix
+from src.utils.route_worker import RouteQueueFull, RouteTimeout, run_route_job
+from src.utils.route_cache import cache_route, cached_route
+from src.utils.preload import warm_route_data
+from src.utils.geocoding import geocode_addresses
+import numpy as np
 from pathlib import Path
-from shapely.geometry import LineString
 import networkx as nx
 import copy
 
@@ -19,16 +25,9 @@ load_dotenv()
 ROOT_DIR = Path(__file__).resolve().parents[2]
 one_map_route = Blueprint('one_map_route', __name__)
 ONEMAP_BASE_URL = "https://www.onemap.gov.sg/api/public/routingsvc/route"
-gmaps = googlemaps.Client(os.getenv("GOOGLE_MAPS_API_KEY"))
-G = ox.load_graphml(ROOT_DIR/"SG_car_network.graphml")
-flood_events_df = pd.read_csv(ROOT_DIR/"flood_events_rows.csv")
-
-flood_events_df['geom_parsed'] = flood_events_df['geom'].apply(
-    lambda g: wkb.loads(bytes.fromhex(g))
-)
-
-
-flood_buffers = gpd.GeoSeries(flood_events_df['geom_parsed']).buffer(0.00090)
+CAR_ROUTE_ENGINES = ("ch",) + ENGINES
+MAX_BATCH_PAIRS = 1000
+MAX_MATRIX_CELLS = 250_000
 
 # def get_all_car_trips_flooded():
 #     response = supabase.table('car_trips_flooded').select('*').execute()
@@ -104,44 +103,80 @@ def get_all_car_trips_by_id():
 
     return jsonify(response.data), 200
 
-def compute_detour_route(G, node_route, flooded_segments):
-    if not flooded_segments:
-        return None  
+def route_nodes(cg, orig_node, dest_node, engine="ch", search=None):
+    """
+    Shortest `length` path on the compact car graph; the "ch" engine falls back to Dijkstra
+    when no hierarchy is built. If a search dict is given it records the engine used, the
+    nodes settled and, for Dijkstra, the search tree that compute_detour_route can reuse.
+    """
+    search = {} if search is None else search
+    if engine == "ch":
+        ch = get_contraction_hierarchy("car", "base")
+        if ch is not None:
+            search["engine"] = "ch"
+            node_route = ch.shortest_path(orig_node, dest_node, stats=search)
+            if node_route is None:
+                raise nx.NetworkXNoPath(f"No path between {orig_node} and {dest_node}.")
+            return node_route
+        engine = "dijkstra"
+
+    search["engine"] = engine
+    if engine == "dijkstra":
+        # Searched backwards from dest so the labels are distances to dest, as the detour needs
+        tree = reverse_dijkstra(cg, orig_node, dest_node)
+        search["settled"] = tree["settled"]
+        search["tree"] = tree
+        return tree_path(cg, tree)
+    return shortest_path(get_graph("car"), orig_node, dest_node, weight="length", engine=engine, stats=search)
+
+def compute_detour_route(cg, node_route, flooded_edges, engine="ch", tree=None, search=None):
+    """
+    Shortest path between the ends of node_route with the flooded edges (u, v, key) penalised.
+    Given the reverse_dijkstra tree of the primary search, only the region around the flooded
+    edges is searched again.
+    """
+    if not flooded_edges:
+        return None
+
+    search = {} if search is None else search
+    orig_node = node_route[0]
+    dest_node = node_route[-1]
+
+    if engine == "ch":
+        ch = get_contraction_hierarchy("car", "flood")
+        overlay = ch.customize(flooded_edges) if ch is not None else None
+        if overlay is not None:
+            search["engine"] = "ch"
+            return ch.shortest_path(orig_node, dest_node, overlay, stats=search)
+        engine = "dijkstra"
 
-    flooded_geoms = {seg["geometry"] for seg in flooded_segments}
-    PENALTY_FACTOR = 1000
-    
-    def weight_function(u, v, data):
-        geom = data.get("geometry")
-        if geom and geom.wkt in flooded_geoms:
-            return data.get("length", 1) * PENALTY_FACTOR
-        return data.get("length", 1)
-    
     try:
-        orig_node = node_route[0]
-        dest_node = node_route[-1]
-        new_node_route = nx.shortest_path(G, orig_node, dest_node, weight=weight_function)
+        if engine == "dijkstra":
+            weights = cg.edge_weights(cg.edge_mask(flooded_edges), FLOOD_PENALTY_FACTOR)
+            if tree is not None and cg.node_ids[tree["orig"]] == orig_node and cg.node_ids[tree["dest"]] == dest_node:
+                search["engine"] = "incremental_dijkstra"
+                return incremental_detour(cg, tree, weights, stats=search)
+            search["engine"] = "dijkstra"
+            detour_tree = reverse_dijkstra(cg, orig_node, dest_node, weights)
+            search["settled"] = detour_tree["settled"]
+            return tree_path(cg, detour_tree)
+
+        def weight_function(u, v, edges):
+            # On a MultiDiGraph NetworkX passes every parallel edge u->v as {key: data}
+            return min(
+                data.get("length", 1) * (FLOOD_PENALTY_FACTOR if (u, v, key) in flooded_edges else 1)
+                for key, data in edges.items()
+            )
+
+        search["engine"] = engine
+        new_node_route = shortest_path(get_graph("car"), orig_node, dest_node, weight=weight_function, engine=engine, stats=search)
         return new_node_route
     except:
         return None
 
-def extract_route_geometry(G, node_route):
+def extract_route_geometry(cg, node_route, weights=None):
     """Extract detailed route geometry from node route"""
-    route_coords = []
-    
-    for u, v in zip(node_route[:-1], node_route[1:]):
-        edge = G.get_edge_data(u, v, 0)
-        if edge and 'geometry' in edge:
-        
-            geom = edge['geometry']
-           
-            route_coords.extend([(pt[1], pt[0]) for pt in geom.coords[:-1]])
-        else:
-            route_coords.append((G.nodes[u]['y'], G.nodes[u]['x']))
-    
-    route_coords.append((G.nodes[node_route[-1]]['y'], G.nodes[node_route[-1]]['x']))
-    
-    return route_coords
+    return cg.route_coords(node_route, weights)
 
 def get_car_route():
     start_address = request.args.get('start_address')
@@ -150,99 +185,109 @@ def get_car_route():
     if not start_address or not end_address:
         return jsonify({"error": "start_address and end_address are required"}), 400
 
-    def geocode_address(address):
-        result = gmaps.geocode(address)
-        if not result:
-            return None
-        return {
-            'lat': result[0]['geometry']['location']['lat'],
-            'lon': result[0]['geometry']['location']['lng']
-        }
+    engine = request.args.get('engine', 'ch')
+    if engine not in CAR_ROUTE_ENGINES:
+        return jsonify({"error": f"engine must be one of: {', '.join(CAR_ROUTE_ENGINES)}"}), 400
 
-    start = geocode_address(start_address)
-    end = geocode_address(end_address)
+    # Both addresses in one round trip
+    geocoded = geocode_addresses([start_address, end_address])
+    if start_address not in geocoded or end_address not in geocoded:
+        return jsonify({"error": "Geocoding timed out"}), 504
+    start, end = geocoded[start_address], geocoded[end_address]
     if not start or not end:
         return jsonify({"error": "Could not geocode one or both addresses"}), 404
 
     try:
-        orig_node = ox.distance.nearest_nodes(G, start['lon'], start['lat'])
-        dest_node = ox.distance.nearest_nodes(G, end['lon'], end['lat'])
-        node_route = nx.shortest_path(G, orig_node, dest_node, weight="length")
+        orig_node, dest_node = get_compact_graph("car").nearest_nodes(
+            [start['lon'], end['lon']], [start['lat'], end['lat']]
+        ).tolist()
     except:
         return jsonify({"error": "Could not compute route using GraphML"}), 500
 
-    
-    route_coords = extract_route_geometry(G, node_route)
+    # Same snapped nodes and flood data give the same route, flooded segments and detour
+    lookup_start = time.perf_counter()
+    flood_version = flood_dataset_version()
+    cached = cached_route(orig_node, dest_node, engine, flood_version)
+    if cached is not None:
+        return jsonify({
+            **cached,
+            "timing": {"cache": "hit", "cache_ms": round((time.perf_counter() - lookup_start) * 1000, 2)},
+        }), 200
+
+    try:
+        result, status = run_route_job(compute_car_route, orig_node, dest_node, engine, warm_up=warm_route_data)
+    except RouteQueueFull:
+        return jsonify({"error": "Too many routes are being computed, try again shortly"}), 503, {"Retry-After": "1"}
+    except RouteTimeout as e:
+        return jsonify({"error": str(e)}), 504
+    if status == 200:
+        cache_route(orig_node, dest_node, engine, {k: v for k, v in result.items() if k != "timing"}, flood_version)
+        result["timing"]["cache"] = "miss"
+    return jsonify(result), status
+
+def compute_car_route(orig_node, dest_node, engine="ch"):
+    """Route, flood delays and detour between two car graph nodes. Returns (result dict, status)."""
+    cg = get_compact_graph("car")
+    try:
+        route_search = {}
+        route_start = time.perf_counter()
+        node_route = route_nodes(cg, orig_node, dest_node, engine=engine, search=route_search)
+        route_ms = (time.perf_counter() - route_start) * 1000
+    except:
+        return {"error": "Could not compute route using GraphML"}, 500
 
-    speeds = {
-        "5kph": 5, "10kph": 10, "20kph": 20,
-        "45kph": 45, "72kph": 72, "81kph": 81,
-        "90kph": 90  # baseline
-    }
     
-    # Precompute speed in m/s
-    speeds_mps = {label: speed * 1000 / 3600 for label, speed in speeds.items()}
+    route_coords = extract_route_geometry(cg, node_route)
 
     flooded_segments = []
-    total_delay = {k: 0.0 for k in speeds.keys()}
-    route_total_length_m = 0
-
-    for u, v in zip(node_route[:-1], node_route[1:]):
-        edge = G.get_edge_data(u, v, 0)
-        if not edge or "length" not in edge:
-            continue
-
-        length_m = edge["length"]
-        route_total_length_m += length_m
-
-        geom = edge.get("geometry")
-        if geom:
-            geom = LineString([(pt[0], pt[1]) for pt in geom.coords])
-        else:
-            geom = LineString([(G.nodes[u]['x'], G.nodes[u]['y']),
-                               (G.nodes[v]['x'], G.nodes[v]['y'])])
-
-        flooded = any(geom.intersects(b) for b in flood_buffers)
-        if flooded:
-            delays = {label: length_m / speed_mps for label, speed_mps in speeds_mps.items()}
-            normal = delays["90kph"]
-            
-            delays_with_suffix = {}
-            for label in speeds.keys():
-                delay = delays[label] - normal
-                delays_with_suffix[label] = delays[label]
-                delays_with_suffix[label + "_delay"] = delay
-                total_delay[label] += delay
-
-            flooded_segments.append({
-                "road_name": edge.get("name", "Unnamed Road"),
-                "geometry": geom.wkt,
-                "length_m": length_m,
-                "travel_time_seconds": delays_with_suffix
-            })
-
-    normal_time_sec = {
-        "5kph":   route_total_length_m / speeds_mps["5kph"],
-        "10kph":  route_total_length_m / speeds_mps["10kph"],
-        "20kph":  route_total_length_m / speeds_mps["20kph"],
-        "45kph":  route_total_length_m / speeds_mps["45kph"],
-        "72kph":  route_total_length_m / speeds_mps["72kph"],
-        "81kph":  route_total_length_m / speeds_mps["81kph"],
-        "90kph":  route_total_length_m / speeds_mps["90kph"]
-    }
-
-    detour_node_route = compute_detour_route(G, node_route, flooded_segments)
+    flooded_edges = set()
+    flood_exposure = get_flood_exposure("car")
+
+    # One row per route edge; edges missing from the graph or without a length are skipped
+    route_edges = cg.route_edges(node_route)
+    valid = route_edges >= 0
+    valid[valid] = ~np.isnan(cg.edge_length[route_edges[valid]])
+    route_edges = route_edges[valid]
+    route_pairs = [pair for pair, ok in zip(zip(node_route[:-1], node_route[1:]), valid.tolist()) if ok]
+    flooded = get_flood_edge_mask("car")[route_edges]
+
+    delays = route_delays(cg.edge_length[route_edges], flooded)
+    total_delay = by_speed(delays["total_delay"])
+    normal_time_sec = by_speed(delays["normal_time"])
+
+    for i in np.flatnonzero(flooded).tolist():
+        u, v = route_pairs[i]
+        pos = int(route_edges[i])
+        key = int(cg.edge_keys[pos])
+        flooded_edges.add((u, v, key))
+
+        travel_time_seconds = {}
+        for label, t, delay in zip(SPEED_LABELS, delays["edge_times"][i].tolist(), delays["edge_delays"][i].tolist()):
+            travel_time_seconds[label] = t
+            travel_time_seconds[label + "_delay"] = delay
+
+        flooded_segments.append({
+            "road_name": cg.edge_names([pos], default="Unnamed Road")[0],
+            "geometry": cg.edge_geometry(pos).wkt,
+            "length_m": float(cg.edge_length[pos]),
+            "flood_ids": flood_exposure[(u, v, key)]["flood_ids"],
+            "travel_time_seconds": travel_time_seconds
+        })
+
+    detour_search = {}
+    detour_start = time.perf_counter()
+    detour_node_route = compute_detour_route(
+        cg, node_route, flooded_edges, engine=engine, tree=route_search.get("tree"), search=detour_search
+    )
+    detour_ms = (time.perf_counter() - detour_start) * 1000
 
     if detour_node_route:
-        detour_coords = extract_route_geometry(G, detour_node_route)
-        detour_length_m = sum(
-            G.get_edge_data(u, v, 0).get("length", 0)
-            for u, v in zip(detour_node_route[:-1], detour_node_route[1:])
-        )
-        detour_total_travel_time_seconds = {
-            label: detour_length_m / speed_mps
-            for label, speed_mps in speeds_mps.items()
-        }
+        # The detour was searched with the flooded edges penalised
+        detour_weights = cg.edge_weights(cg.edge_mask(flooded_edges), FLOOD_PENALTY_FACTOR)
+        detour_coords = extract_route_geometry(cg, detour_node_route, detour_weights)
+        detour_edges = cg.route_edges(detour_node_route, detour_weights)
+        detour_length_m = float(np.nansum(cg.edge_length[detour_edges[detour_edges >= 0]]))
+        detour_total_travel_time_seconds = by_speed(detour_length_m / SPEEDS_MPS)
         has_detour = True
     else:
         detour_coords = None
@@ -251,7 +296,7 @@ def get_car_route():
 
     detour_comparison = {}
     if has_detour:
-        for label in speeds.keys():
+        for label in SPEED_LABELS:
             flooded_time = normal_time_sec[label] + total_delay[label]
             detour_time = detour_total_travel_time_seconds[label]
             detour_comparison[label] = {
@@ -260,7 +305,7 @@ def get_car_route():
                 "difference_sec": detour_time - flooded_time
             }
 
-    return jsonify({
+    return {
         "route_geometry": route_coords,
         "overall_route_status": "flooded" if flooded_segments else "clear",
         "flooded_segments": flooded_segments,
@@ -269,5 +314,237 @@ def get_car_route():
         "has_detour": has_detour,
         "detour_route_geometry": detour_coords,
         "detour_total_travel_time_seconds": detour_total_travel_time_seconds,
-        "detour_comparison": detour_comparison
-    }), 200
\ No newline at end of file
+        "detour_comparison": detour_comparison,
+        "timing": {
+            "route_engine": route_search["engine"],
+            "route_ms": round(route_ms, 2),
+            "route_settled_nodes": route_search.get("settled"),
+            # "skipped" when no route edge is flooded
+            "detour_engine": detour_search.get("engine", "skipped"),
+            "detour_ms": round(detour_ms, 2),
+            "detour_settled_nodes": detour_search.get("settled"),
+            # Distance labels of the route search reused instead of being recomputed
+            "detour_reused_labels": detour_search.get("reused_labels", 0),
+        }
+    }, 200
+
+def _geocode_items(items, prefixes=("",)):
+    """Geocode, concurrently, every <prefix>address of the items that has no <prefix>lat/lon."""
+    addresses = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        for prefix in prefixes:
+            if item.get(f"{prefix}lat") is None or item.get(f"{prefix}lon") is None:
+                address = item.get(f"{prefix}address")
+                if address and isinstance(address, str):
+                    addresses.append(address)
+    return geocode_addresses(addresses)
+
+def _resolve_point(item, geocoded, prefix=""):
+    """
+    (lon, lat) of a request point given as <prefix>lat/<prefix>lon or <prefix>address,
+    with addresses looked up in the _geocode_items result.
+    """
+    lat, lon = item.get(f"{prefix}lat"), item.get(f"{prefix}lon")
+    if lat is not None and lon is not None:
+        return float(lon), float(lat)
+    address = item.get(f"{prefix}address")
+    if address is not None and not isinstance(address, str):
+        raise ValueError(f"{prefix}address must be a string")
+    if not address:
+        raise ValueError(f"{prefix}address or {prefix}lat/{prefix}lon is required")
+    if address not in geocoded:
+        raise LookupError(f"Timed out geocoding {prefix}address")
+    if not geocoded[address]:
+        raise LookupError(f"Could not geocode {prefix}address")
+    return geocoded[address]['lon'], geocoded[address]['lat']
+
+def compute_route_batch(points):
+    """
+    Flood status and delays for (pair index, start lon, start lat, end lon, end lat) points.
+    Returns ({pair index: result}, timing).
+    """
+    timing = {}
+    results = {}
+    cg = get_compact_graph("car")
+    flood_mask = get_flood_edge_mask("car")
+    flood_exposure = get_flood_exposure("car")
+
+    # Snap every start and end point in one call
+    snap_start = time.perf_counter()
+    if points:
+        index, start_lon, start_lat, end_lon, end_lat = map(list, zip(*points))
+        nodes = cg.nearest_nodes(start_lon + end_lon, start_lat + end_lat).tolist()
+        orig_nodes, dest_nodes = nodes[:len(points)], nodes[len(points):]
+    else:
+        index, orig_nodes, dest_nodes = [], [], []
+    timing["snap_ms"] = round((time.perf_counter() - snap_start) * 1000, 2)
+
+    # One one-to-many search per distinct origin
+    search_start = time.perf_counter()
+    by_origin = {}
+    for i, orig_node, dest_node in zip(index, orig_nodes, dest_nodes):
+        by_origin.setdefault(orig_node, []).append((i, dest_node))
+
+    for orig_node, targets in by_origin.items():
+        paths = one_to_many(cg, orig_node, list({dest for _, dest in targets}))
+        for i, dest_node in targets:
+            node_route = paths[dest_node]
+            if node_route is None:
+                results[i] = {"index": i, "start_node": orig_node, "end_node": dest_node,
+                              "error": "No route between the snapped nodes"}
+                continue
+
+            route_edges = cg.route_edges(node_route)
+            route_edges = route_edges[route_edges >= 0]
+            route_edges = route_edges[~np.isnan(cg.edge_length[route_edges])]
+            flooded = flood_mask[route_edges]
+            lengths = cg.edge_length[route_edges]
+            delays = route_delays(lengths, flooded)
+
+            flood_ids = set()
+            for (u, v, key) in cg.edge_ids(route_edges[flooded]):
+                flood_ids.update(flood_exposure[(u, v, key)]["flood_ids"])
+
+            results[i] = {
+                "index": i,
+                "start_node": orig_node,
+                "end_node": dest_node,
+                "overall_route_status": "flooded" if flooded.any() else "clear",
+                "route_length_m": float(lengths.sum()),
+                "flooded_length_m": float(lengths[flooded].sum()),
+                "flooded_segment_count": int(flooded.sum()),
+                "flood_ids": sorted(flood_ids),
+                "normal_travel_time_seconds": by_speed(delays["normal_time"]),
+                "total_delay_seconds": by_speed(delays["total_delay"]),
+            }
+    timing["search_ms"] = round((time.perf_counter() - search_start) * 1000, 2)
+    timing["origins"] = len(by_origin)
+    return results, timing
+
+
+def get_car_route_batch():
+    body = request.get_json(silent=True) or {}
+    pairs = body.get("pairs")
+    if not isinstance(pairs, list) or not pairs:
+        return jsonify({"error": "pairs must be a non-empty list"}), 400
+    if len(pairs) > MAX_BATCH_PAIRS:
+        return jsonify({"error": f"At most {MAX_BATCH_PAIRS} pairs per request"}), 400
+
+    timing = {}
+    start_time = time.perf_counter()
+    results = [None] * len(pairs)
+    points = []  # (pair index, start lon, start lat, end lon, end lat)
+    geocoded = _geocode_items(pairs, ("start_", "end_"))
+    for i, pair in enumerate(pairs):
+        try:
+            if not isinstance(pair, dict):
+                raise ValueError("each pair must be an object")
+            points.append((i,) + _resolve_point(pair, geocoded, "start_") + _resolve_point(pair, geocoded, "end_"))
+        except (LookupError, TypeError, ValueError) as e:
+            results[i] = {"index": i, "error": str(e)}
+    timing["geocode_ms"] = round((time.perf_counter() - start_time) * 1000, 2)
+
+    try:
+        routed, route_timing = run_route_job(compute_route_batch, points, warm_up=warm_route_data)
+    except RouteQueueFull:
+        return jsonify({"error": "Too many routes are being computed, try again shortly"}), 503, {"Retry-After": "1"}
+    except RouteTimeout as e:
+        return jsonify({"error": str(e)}), 504
+    for i, result in routed.items():
+        results[i] = result
+    timing.update(route_timing)
+    timing["total_ms"] = round((time.perf_counter() - start_time) * 1000, 2)
+
+    for i, pair in enumerate(pairs):
+        if isinstance(pair, dict) and "id" in pair:
+            results[i]["id"] = pair["id"]
+
+    return jsonify({
+        "count": len(results),
+        "results": results,
+        "timing": timing
+    }), 200
+
+def get_car_od_matrix():
+    body = request.get_json(silent=True) or {}
+    origins = body.get("origins")
+    destinations = body.get("destinations") or origins
+    speed = body.get("speed", "20kph")
+    out_fmt = (body.get("format") or "json").lower()
+
+    if not isinstance(origins, list) or not origins or not isinstance(destinations, list):
+        return jsonify({"error": "origins must be a non-empty list"}), 400
+    if len(origins) * len(destinations) > MAX_MATRIX_CELLS:
+        return jsonify({"error": f"At most {MAX_MATRIX_CELLS} origin x destination cells per request"}), 400
+    if speed not in SPEED_LABELS or speed == NORMAL_SPEED:
+        flood_speeds = [label for label in SPEED_LABELS if label != NORMAL_SPEED]
+        return jsonify({"error": f"speed must be one of: {', '.join(flood_speeds)}"}), 400
+    if out_fmt not in ("json", "npz"):
+        return jsonify({"error": "format must be json or npz"}), 400
+    try:
+        workers = max(int(body["workers"]), 1) if body.get("workers") is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "workers must be an integer"}), 400
+
+    geocoded = _geocode_items(origins + destinations)
+    points = {}
+    for name, items in (("origins", origins), ("destinations", destinations)):
+        try:
+            points[name] = [_resolve_point(item, geocoded) for item in items]
+        except (AttributeError, TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid {name}: {e}"}), 400
+        except LookupError as e:
+            return jsonify({"error": f"Invalid {name}: {e}"}), 404
+
+    cg = get_compact_graph("car")
+    start_time = time.perf_counter()
+    lons, lats = zip(*(points["origins"] + points["destinations"]))
+    nodes = cg.nearest_nodes(lons, lats)
+    orig_nodes, dest_nodes = nodes[:len(origins)], nodes[len(origins):]
+
+    try:
+        result = od_matrix("car", orig_nodes, dest_nodes, get_flood_edge_mask("car"), workers=workers)
+    except RouteQueueFull:
+        return jsonify({"error": "Too many routes are being computed, try again shortly"}), 503, {"Retry-After": "1"}
+    except RouteTimeout as e:
+        return jsonify({"error": str(e)}), 504
+    normal, flooded, delay = flood_travel_times(result["length_m"], result["flooded_length_m"], speed)
+    compute_ms = round((time.perf_counter() - start_time) * 1000, 2)
+
+    origin_ids = [item.get("id", i) for i, item in enumerate(origins)]
+    destination_ids = [item.get("id", i) for i, item in enumerate(destinations)]
+
+    if out_fmt == "npz":
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            origin_ids=np.array([str(x) for x in origin_ids]),
+            destination_ids=np.array([str(x) for x in destination_ids]),
+            origin_nodes=orig_nodes,
+            destination_nodes=dest_nodes,
+            length_m=result["length_m"],
+            flooded_length_m=result["flooded_length_m"],
+            normal_time_sec=normal,
+            flooded_time_sec=flooded,
+            delay_sec=delay,
+        )
+        buffer.seek(0)
+        return send_file(buffer, mimetype="application/octet-stream",
+                         as_attachment=True, download_name="car_od_matrix.npz")
+
+    def to_list(matrix):
+        # Unreachable pairs become null
+        return [[x if np.isfinite(x) else None for x in row] for row in matrix.tolist()]
+
+    return jsonify({
+        "origins": origin_ids,
+        "destinations": destination_ids,
+        "speed": speed,
+        "normal_time_sec": to_list(normal),
+        "flooded_time_sec": to_list(flooded),
+        "delay_sec": to_list(delay),
+        "flooded_length_m": to_list(result["flooded_length_m"]),
+        "timing": {"compute_ms": compute_ms, "workers": result["workers"]}
+    }), 200
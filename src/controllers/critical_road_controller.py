@@ -1,7 +1,6 @@
 from pathlib import Path
 from src.database import supabase
 from flask import jsonify, request, Blueprint
-import osmnx as ox
 import os
 from collections import Counter
 import pandas as pd
@@ -9,86 +8,99 @@ import json
 from datetime import datetime
 import requests
 import math
+import threading
+import numpy as np
 from shapely import wkb
 from dotenv import load_dotenv
 from src.utils.onemap_auth import get_valid_token
+from src.utils.centrality import CENTRALITY_PKLS, centrality_array
+from src.utils.geojson_stream import feature_collection_response, precision_arg
+from src.utils.graph_registry import get_compact_graph
+from src.utils.road_name_index import RoadNameIndex
 import geopandas as gpd
 from shapely import wkb
-from shapely.geometry import LineString, Point, mapping
-import pickle
+from shapely.geometry import LineString, Point, box, mapping
 
 # PROJECT_ROOT = Path(__file__).resolve().parents[2]
 
-BETWEENNESS_PKL = "Gcar_edge_betweenness_centrality.pkl"
-CLOSENESS_PKL = "Gcar_edge_closeness_centrality.pkl"
-# BETWEENNESS_PKL = "../../Gcar_edge_betweenness_centrality.pkl"
-# CLOSENESS_PKL   = "../../Gcar_edge_closeness_centrality.pkl"
-
-# Lazy, in-process caches
+# Lazy, in-process caches: bus edges with a column per centrality metric (see src.utils.centrality),
+# and per metric the edge rows in descending order plus each row's place in that order
 _EDGES_WGS84 = None
-_METRICS = {}
-
-def _ensure_edges_loaded():
-    global _EDGES_WGS84
-    if _EDGES_WGS84 is not None:
-        return
-    # Use your global G (import from wherever you keep it)
-    # e.g., from app_state import G
-    from app import G  # <-- change to your actual module if needed
-    edges = ox.graph_to_gdfs(G, nodes=False).reset_index()  # typically EPSG:4326 already
-    # Normalize columns used in properties
-    if "road_name" not in edges.columns:
-        edges["road_name"] = edges.get("name").fillna("(unnamed)")
-    if "road_type" not in edges.columns:
-        edges["road_type"] = edges.get("highway")
-    _EDGES_WGS84 = edges
-
-def _load_metric(metric: str):
-    """Load a centrality dict keyed by (u,v,key). Cached."""
-    if metric in _METRICS:
-        return _METRICS[metric]
-    if metric == "betweenness":
-        pkl_path = BETWEENNESS_PKL
-    elif metric == "closeness":
-        pkl_path = CLOSENESS_PKL
-    else:
-        raise ValueError("metric must be 'betweenness' or 'closeness'")
-    with open(pkl_path, "rb") as f:
-        data = pickle.load(f)
-    _METRICS[metric] = data
-    return data
-
-
+_RANKINGS = {}
+_ROAD_NAMES = None
+_LOCK = threading.RLock()
 
 def _ensure_edges_loaded():
     global _EDGES_WGS84
     if _EDGES_WGS84 is not None:
         return
-    # Use your global G (import from wherever you keep it)
-    # e.g., from app_state import G
-    from app import G  # <-- change to your actual module if needed
-    edges = ox.graph_to_gdfs(G, nodes=False).reset_index()  # typically EPSG:4326 already
-    # Normalize columns used in properties
-    if "road_name" not in edges.columns:
-        edges["road_name"] = edges.get("name").fillna("(unnamed)")
-    if "road_type" not in edges.columns:
-        edges["road_type"] = edges.get("highway")
-    _EDGES_WGS84 = edges
+    with _LOCK:
+        if _EDGES_WGS84 is not None:
+            return
+        edges = get_compact_graph("bus").edge_frame()
+        # Normalize columns used in properties
+        if "road_name" not in edges.columns:
+            edges["road_name"] = edges.get("name").fillna("(unnamed)")
+        if "road_type" not in edges.columns:
+            edges["road_type"] = edges.get("highway")
+        # Build the spatial index now so bbox queries never pay for it
+        edges.sindex
+        _EDGES_WGS84 = edges
 
 def _load_metric(metric: str):
-    """Load a centrality dict keyed by (u,v,key). Cached."""
-    if metric in _METRICS:
-        return _METRICS[metric]
-    if metric == "betweenness":
-        pkl_path = BETWEENNESS_PKL
-    elif metric == "closeness":
-        pkl_path = CLOSENESS_PKL
-    else:
+    """Attach a centrality metric to the edge table as a column (once) and return its name."""
+    _ensure_edges_loaded()
+    if metric not in CENTRALITY_PKLS:
         raise ValueError("metric must be 'betweenness' or 'closeness'")
-    with open(pkl_path, "rb") as f:
-        data = pickle.load(f)
-    _METRICS[metric] = data
-    return data
+    if metric in _RANKINGS:
+        return metric
+    with _LOCK:
+        if metric not in _RANKINGS:
+            values = centrality_array("bus", metric)
+            # Stable, so equal scores keep edge order
+            order = np.argsort(-values, kind="stable")
+            ranks = np.empty_like(order)
+            ranks[order] = np.arange(len(order))
+            _EDGES_WGS84[metric] = values
+            # Set last: a ranking in _RANKINGS means the column is there too
+            _RANKINGS[metric] = (order, ranks)
+    return metric
+
+def _road_name_index():
+    """Name index of the edge table, with each name's edges ranked by betweenness. Built once."""
+    global _ROAD_NAMES
+    if _ROAD_NAMES is None:
+        with _LOCK:
+            if _ROAD_NAMES is None:
+                _load_metric("betweenness")
+                names = _EDGES_WGS84["road_name"].astype("string").fillna("").tolist()
+                _ROAD_NAMES = RoadNameIndex(names, _RANKINGS["betweenness"][1])
+    return _ROAD_NAMES
+
+def _feature_properties(sel, metric: str):
+    """GeoJSON feature properties of ranked edge rows, built column by column."""
+    scores = sel[metric].to_numpy(dtype=float)
+    max_score = float(scores.max()) if len(scores) else 0.0
+    norms = scores / max_score if max_score > 0 else np.zeros(len(scores))
+    columns = zip(
+        sel["u"].tolist(), sel["v"].tolist(), sel["key"].tolist(),
+        sel["road_name"].tolist(), sel["road_type"].tolist(),
+        sel["length"].fillna(0.0).astype(float).tolist(), scores.tolist(), norms.tolist(),
+    )
+    return [{
+        "u": u, "v": v, "key": key,
+        "road_name": road_name, "road_type": road_type,
+        "length": length,
+        metric: score,
+        "norm_"+metric: norm,
+        "rank": rank,
+        "is_critical": True
+    } for rank, (u, v, key, road_name, road_type, length, score, norm) in enumerate(columns, start=1)]
+
+def _bbox_rows(bbox: str):
+    """Rows of the edge table intersecting a "minx,miny,maxx,maxy" (WGS84) box. Raises ValueError if malformed."""
+    minx, miny, maxx, maxy = map(float, bbox.split(","))
+    return np.sort(_EDGES_WGS84.sindex.query(box(minx, miny, maxx, maxy), predicate="intersects"))
 
 # @bp_critical.route("/top_critical_segments", methods=["GET"])
 def top_critical_segments():
@@ -98,59 +110,42 @@ def top_critical_segments():
       - metric=betweenness|closeness (default: betweenness)
       - limit=int (default: 50, max: 1000)
       - bbox=minx,miny,maxx,maxy (optional, WGS84)
+      - precision=int (optional, decimals kept in coordinates; default: all)
     """
     try:
         _ensure_edges_loaded()
         metric = request.args.get("metric", "betweenness").lower()
         limit = min(max(int(request.args.get("limit", 50)), 1), 1000)
         bbox = request.args.get("bbox", "").strip()
-        
-        metric_map = _load_metric(metric)
-        gdf = _EDGES_WGS84.copy()
+        precision = precision_arg(request.args.get("precision"))
 
-        # Optional bbox filter
+        _load_metric(metric)
+        order, ranks = _RANKINGS[metric]
+
+        # Optional bbox filter: the best-ranked edges among those in the box, no full sort
         if bbox:
             try:
-                minx, miny, maxx, maxy = map(float, bbox.split(","))
-                gdf = gdf.clip_by_rect(minx, miny, maxx, maxy)
-            except Exception:
+                rows = _bbox_rows(bbox)
+            except ValueError:
                 return jsonify({"error": "Invalid bbox. Use minx,miny,maxx,maxy"}), 400
+            if len(rows) > limit:
+                rows = rows[np.argpartition(ranks[rows], limit)[:limit]]
+            rows = rows[np.argsort(ranks[rows])]
+        else:
+            rows = order[:limit]
 
-        # Attach centrality
-        gdf[metric] = gdf.apply(lambda r: float(metric_map.get((r["u"], r["v"], r["key"]), 0.0)), axis=1)
-
-        if gdf.empty:
+        if len(rows) == 0:
             return jsonify({
                 "type": "FeatureCollection", "properties": {"metric": metric, "count": 0}, "features": []
             }), 200
 
-        top = gdf.sort_values(metric, ascending=False).head(limit).copy()
-        max_c = float(top[metric].max())
-        top["norm_"+metric] = top[metric] / max_c if max_c > 0 else 0.0
-
-        features = []
-        for rank, (_, row) in enumerate(top.iterrows(), start=1):
-            props = {
-                "u": int(row["u"]), "v": int(row["v"]), "key": int(row["key"]),
-                "road_name": row.get("road_name", "(unnamed)"),
-                "road_type": row.get("road_type", "Unknown"),
-                "length": float(row.get("length") or 0.0),
-                metric: float(row[metric]),
-                "norm_"+metric: float(row["norm_"+metric]),
-                "rank": rank,
-                "is_critical": True
-            }
-            features.append({
-                "type": "Feature",
-                "properties": props,
-                "geometry": mapping(row["geometry"])
-            })
-
-        return jsonify({
-            "type": "FeatureCollection",
-            "properties": {"metric": metric, "count": len(features)},
-            "features": features
-        }), 200
+        top = _EDGES_WGS84.iloc[rows]
+        return feature_collection_response(
+            {"metric": metric, "count": len(top)},
+            _feature_properties(top, metric),
+            top.geometry.array,
+            precision,
+        ), 200
 
     except FileNotFoundError:
         return jsonify({"error": f"Centrality file not found for '{metric}'"}), 404
@@ -171,10 +166,11 @@ def road_criticality():
       - limit=int (default: 100, max: 2000)
       - bbox=minx,miny,maxx,maxy (optional, WGS84)
       - format=geojson|json (default: geojson)
+      - precision=int (optional, decimals kept in GeoJSON coordinates; default: all)
     """
     try:
         _ensure_edges_loaded()
-        bet_map = _load_metric("betweenness")
+        _load_metric("betweenness")
 
         road_name = (request.args.get("road_name") or "").strip()
         if not road_name:
@@ -183,40 +179,27 @@ def road_criticality():
         match_mode = (request.args.get("match") or "contains").lower()
         limit = min(max(int(request.args.get("limit", 100)), 1), 2000)
         out_fmt = (request.args.get("format") or "geojson").lower()
-
-        gdf = _EDGES_WGS84.copy()
+        precision = precision_arg(request.args.get("precision"))
 
         # Optional bbox filter
         bbox = request.args.get("bbox", "").strip()
         if bbox:
             try:
-                minx, miny, maxx, maxy = map(float, bbox.split(","))
-                gdf = gdf.clip_by_rect(minx, miny, maxx, maxy)
-            except Exception:
+                in_bbox = _bbox_rows(bbox)
+            except ValueError:
                 return jsonify({"error": "Invalid bbox. Use minx,miny,maxx,maxy"}), 400
 
-       # make sure everything is a string and no NAs survive
-        rn = gdf["road_name"].astype("string").fillna("")
-
-        if match_mode == "exact":
-            # case-insensitive exact match
-            mask = rn.str.casefold() == road_name.casefold()
-        else:
-            # substring match; ensure no NA in result
-            mask = rn.str.contains(road_name, case=False, regex=False, na=False)
-
-        # extra safety: if anything weird slipped through
-        # mask = mask.fillna(False)
-
-        sel = gdf.loc[mask].copy()
+        # Case-insensitive exact or substring match, already ranked by betweenness
+        rows = _road_name_index().rows(road_name, "exact" if match_mode == "exact" else "contains")
+        if bbox:
+            rows = rows[np.isin(rows, in_bbox)]
 
-        # Attach betweenness
-        sel["betweenness"] = sel.apply(lambda r: float(bet_map.get((r["u"], r["v"], r["key"]), 0.0)), axis=1)
-        sel = sel.sort_values("betweenness", ascending=False).head(limit)
-        max_b = float(sel["betweenness"].max())
-        sel["norm_betweenness"] = sel["betweenness"] / max_b if max_b > 0 else 0.0
+        sel = _EDGES_WGS84.iloc[rows[:limit]]
 
         if out_fmt == "json":
+            sel = sel.copy()
+            max_b = float(sel["betweenness"].max())
+            sel["norm_betweenness"] = sel["betweenness"] / max_b if max_b > 0 else 0.0
             data = []
             for rank, (_, row) in enumerate(sel.iterrows(), start=1):
                 data.append({
@@ -234,35 +217,53 @@ def road_criticality():
                 "segments": data
             }), 200
 
-        # GeoJSON for Mapbox
-        features = []
-        for rank, (_, row) in enumerate(sel.iterrows(), start=1):
-            features.append({
-                "type": "Feature",
-                "properties": {
-                    "u": int(row["u"]), "v": int(row["v"]), "key": int(row["key"]),
-                    "road_name": row.road_name, "road_type": row.road_type,
-                    "length": float(row.get("length") or 0.0),
-                    "betweenness": float(row.betweenness),
-                    "norm_betweenness": float(row.norm_betweenness),
-                    "rank": rank,
-                    "is_critical": True
-                },
-                "geometry": mapping(row.geometry)
-            })
-
-        return jsonify({
-            "type": "FeatureCollection",
-            "properties": {
+        # GeoJSON for Mapbox, streamed
+        return feature_collection_response(
+            {
                 "road_query": road_name,
                 "match": match_mode,
                 "metric": "betweenness",
-                "count": len(features)
+                "count": len(sel)
             },
-            "features": features
-        }), 200
+            _feature_properties(sel, "betweenness"),
+            sel.geometry.array,
+            precision,
+        ), 200
+
+    except FileNotFoundError:
+        return jsonify({"error": "Betweenness pickle not found"}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# ============================================================
+# Endpoint 3: Road-name autocomplete
+# ============================================================
+def road_name_suggestions():
+    """
+    Road names containing a partial query, for the road_criticality search box. Names
+    starting with the query come first, then by their most critical segment.
+    Query params:
+      - q (required)
+      - limit=int (default: 10, max: 50)
+    """
+    try:
+        query = (request.args.get("q") or "").strip()
+        if not query:
+            return jsonify({"error": "q is required"}), 400
+        limit = min(max(int(request.args.get("limit", 10)), 1), 50)
+
+        index = _road_name_index()
+        betweenness = _EDGES_WGS84["betweenness"].to_numpy()
+        suggestions = [{
+            "road_name": name,
+            "segments": int(len(rows)),
+            "max_betweenness": float(betweenness[rows[0]]),
+        } for name, rows in index.suggest(query, limit, exclude=("", "(unnamed)"))]
+
+        return jsonify({"query": query, "count": len(suggestions), "suggestions": suggestions}), 200
 
     except FileNotFoundError:
         return jsonify({"error": "Betweenness pickle not found"}), 404
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,25 @@
+from flask import jsonify
+from src.utils.graph_registry import graph_stats
+from src.utils.preload import memory_report
+from src.utils.route_worker import route_worker_metrics
+from src.utils.route_cache import route_cache_stats
+from src.utils.geocoding import geocode_stats
+
+
+def get_graph_stats():
+    return jsonify(graph_stats()), 200
+
+
+def get_memory_report():
+    report = memory_report()
+    if report is None:
+        return jsonify({"error": "Memory report is only available on Linux"}), 501
+    return jsonify(report), 200
+
+
+def get_route_worker_metrics():
+    return jsonify(route_worker_metrics()), 200
+
+
+def get_cache_stats():
+    return jsonify({"car_route": route_cache_stats(), "geocode": geocode_stats()}), 200
@@ -58,12 +58,59 @@ car_trips_detailed_example = [
                 "geometry": "LINESTRING (103.8419805 1.3114891, 103.8416957 1.3116266)",
                 "length_m": 717.9183136101102,
                 "road_name": "Bukit Timah Road",
+                "flood_ids": [71, 74],
                 "travel_time_seconds": {"10kph": 258.4505928996397, "10kph_delay": 229.73386035523527}
             }
         ],
         "has_detour": True,
         "normal_travel_time_seconds": {"10kph": 3283.905163989614, "20kph": 1641.952581994807},
         "overall_route_status": "flooded",
-        "route_geometry": [[1.2976481, 103.8532709], [1.2978206, 103.8534083]]
+        "route_geometry": [[1.2976481, 103.8532709], [1.2978206, 103.8534083]],
+        "timing": {
+            "route_engine": "dijkstra", "route_ms": 20.82, "route_settled_nodes": 3597,
+            "detour_engine": "incremental_dijkstra", "detour_ms": 1.15, "detour_settled_nodes": 103,
+            "detour_reused_labels": 3597, "cache": "miss"
+        }
     }
-]
\ No newline at end of file
+]
+
+car_route_batch_request_example = {
+    "pairs": [
+        {"id": "trip-1", "start_address": "143 Victoria St, Singapore 188019", "end_address": "961 Bukit Timah Rd, Singapore 588179"},
+        {"id": "trip-2", "start_lat": 1.3461312, "start_lon": 103.7472412, "end_lat": 1.30907436213629, "end_lon": 103.837046750208}
+    ]
+}
+
+car_route_batch_example = {
+    "count": 2,
+    "results": [
+        {
+            "index": 0, "id": "trip-1", "start_node": 1743861070, "end_node": 240701697,
+            "overall_route_status": "flooded", "route_length_m": 9121.4, "flooded_length_m": 717.9,
+            "flooded_segment_count": 3, "flood_ids": [71, 74],
+            "normal_travel_time_seconds": {"5kph": 6567.4, "10kph": 3283.7, "20kph": 1641.9, "45kph": 729.7, "72kph": 456.1, "81kph": 405.4, "90kph": 364.9},
+            "total_delay_seconds": {"5kph": 488.2, "10kph": 229.7, "20kph": 100.5, "45kph": 28.7, "72kph": 7.2, "81kph": 3.2, "90kph": 0.0}
+        },
+        {"index": 1, "id": "trip-2", "error": "Could not geocode end_address"}
+    ],
+    "timing": {"geocode_ms": 412.5, "snap_ms": 3.1, "search_ms": 48.7, "origins": 2, "total_ms": 464.3}
+}
+
+car_od_matrix_request_example = {
+    "origins": [
+        {"id": "BK", "lat": 1.3491, "lon": 103.7496},
+        {"id": "NT", "lat": 1.3121, "lon": 103.8381}
+    ],
+    "speed": "20kph"
+}
+
+car_od_matrix_example = {
+    "origins": ["BK", "NT"],
+    "destinations": ["BK", "NT"],
+    "speed": "20kph",
+    "normal_time_sec": [[0.0, 561.3], [566.8, 0.0]],
+    "flooded_time_sec": [[0.0, 712.9], [718.4, 0.0]],
+    "delay_sec": [[0.0, 151.6], [151.6, 0.0]],
+    "flooded_length_m": [[0.0, 1080.5], [1080.5, 0.0]],
+    "timing": {"compute_ms": 95.2, "workers": 1}
+}
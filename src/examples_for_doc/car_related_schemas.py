@@ -99,12 +99,97 @@ car_trips_detailed_schema = {
             "geometry": {"type": "string"},
             "length_m": {"type": "number"},
             "road_name": {"type": "string"},
+            "flood_ids": {"type": "array", "items": {"type": "integer"}, "description": "Flood events whose buffer intersects this segment"},
             "travel_time_seconds": {"type": "object"}
         }}},
         "has_detour": {"type": "boolean"},
         "normal_travel_time_seconds": {"type": "object"},
         "overall_route_status": {"type": "string"},
-        "route_geometry": {"type": "array", "items": {"type": "array", "items": {"type": "number"}}}
+        "route_geometry": {"type": "array", "items": {"type": "array", "items": {"type": "number"}}},
+        "timing": {"type": "object", "description": "Engine, time (ms) and nodes settled by the route and detour searches; detour_reused_labels counts route-search labels the detour reused. cache is \"miss\" when the route was computed; a route served from the cache only reports cache: \"hit\" and cache_ms"}
+    }
+}
+}
+
+
+car_route_batch_request_schema = {
+    "type": "object",
+    "required": ["pairs"],
+    "properties": {
+        "pairs": {
+            "type": "array",
+            "maxItems": 1000,
+            "description": "Origin/destination pairs, each given as addresses or as lat/lon",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"description": "Optional caller reference, echoed back in the result"},
+                    "start_address": {"type": "string"},
+                    "end_address": {"type": "string"},
+                    "start_lat": {"type": "number"},
+                    "start_lon": {"type": "number"},
+                    "end_lat": {"type": "number"},
+                    "end_lon": {"type": "number"}
+                }
+            }
+        }
+    }
+}
+
+car_route_batch_schema = {
+    "type": "object",
+    "properties": {
+        "count": {"type": "integer"},
+        "results": {"type": "array", "items": {"type": "object", "properties": {
+            "index": {"type": "integer", "description": "Position of the pair in the request"},
+            "id": {"description": "The pair's id, if one was given"},
+            "start_node": {"type": "integer"},
+            "end_node": {"type": "integer"},
+            "overall_route_status": {"type": "string", "enum": ["flooded", "clear"]},
+            "route_length_m": {"type": "number"},
+            "flooded_length_m": {"type": "number"},
+            "flooded_segment_count": {"type": "integer"},
+            "flood_ids": {"type": "array", "items": {"type": "integer"}},
+            "normal_travel_time_seconds": {"type": "object"},
+            "total_delay_seconds": {"type": "object"},
+            "error": {"type": "string", "description": "Set instead of the route fields when the pair could not be routed"}
+        }}},
+        "timing": {"type": "object", "description": "Milliseconds spent geocoding, snapping and searching, and the number of distinct origins"}
+    }
+}
+
+_matrix_point_schema = {
+    "type": "object",
+    "properties": {
+        "id": {"description": "Label for the row/column, e.g. a planning area code such as \"AM\""},
+        "address": {"type": "string"},
+        "lat": {"type": "number"},
+        "lon": {"type": "number"}
+    }
+}
+
+car_od_matrix_request_schema = {
+    "type": "object",
+    "required": ["origins"],
+    "properties": {
+        "origins": {"type": "array", "items": _matrix_point_schema},
+        "destinations": {"type": "array", "items": _matrix_point_schema, "description": "Defaults to the origins"},
+        "speed": {"type": "string", "enum": ["5kph", "10kph", "20kph", "45kph", "72kph", "81kph"], "default": "20kph", "description": "Speed on flooded road segments; other segments use 90kph"},
+        "format": {"type": "string", "enum": ["json", "npz"], "default": "json", "description": "npz returns a NumPy archive with the same matrices plus node ids"},
+        "workers": {"type": "integer", "description": "Route worker processes to split the origins across (default and maximum: ROUTE_WORKERS)"}
+    }
+}
+
+car_od_matrix_schema = {
+    "type": "object",
+    "properties": {
+        "origins": {"type": "array", "items": {}},
+        "destinations": {"type": "array", "items": {}},
+        "speed": {"type": "string"},
+        "normal_time_sec": {"type": "array", "items": {"type": "array", "items": {"type": "number"}}, "description": "[origin][destination], null if unreachable"},
+        "flooded_time_sec": {"type": "array", "items": {"type": "array", "items": {"type": "number"}}},
+        "delay_sec": {"type": "array", "items": {"type": "array", "items": {"type": "number"}}},
+        "flooded_length_m": {"type": "array", "items": {"type": "array", "items": {"type": "number"}}},
+        "timing": {"type": "object"}
     }
 }
-}
\ No newline at end of file
@@ -123,4 +123,13 @@ road_criticality_example = {
             }
         }
     ]
-}
\ No newline at end of file
+}
+
+road_name_suggestions_example = {
+    "query": "sim",
+    "count": 2,
+    "suggestions": [
+        {"road_name": "Simei Avenue", "segments": 24, "max_betweenness": 0.013764875069258779},
+        {"road_name": "Simei Street 1", "segments": 18, "max_betweenness": 0.004127316852930911}
+    ]
+}
@@ -279,4 +279,46 @@ road_criticality_schema = {
         }
     },
     "required": ["type", "properties", "features"]
-}
\ No newline at end of file
+}
+
+road_name_suggestions_schema = {
+    "type": "object",
+    "description": "Road names matching a partial query, most relevant first.",
+    "properties": {
+        "query": {
+            "type": "string",
+            "description": "The q string used in the request.",
+            "example": "sim"
+        },
+        "count": {
+            "type": "integer",
+            "description": "Number of suggestions returned.",
+            "example": 2
+        },
+        "suggestions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "road_name": {
+                        "type": "string",
+                        "description": "Road name, as spelled in the road network.",
+                        "example": "Simei Avenue"
+                    },
+                    "segments": {
+                        "type": "integer",
+                        "description": "Number of road segments with this name.",
+                        "example": 24
+                    },
+                    "max_betweenness": {
+                        "type": "number",
+                        "description": "Highest betweenness centrality among those segments.",
+                        "example": 0.013764875069258779
+                    }
+                },
+                "required": ["road_name", "segments", "max_betweenness"]
+            }
+        }
+    },
+    "required": ["query", "count", "suggestions"]
+}
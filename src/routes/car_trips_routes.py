@@ -3,7 +3,7 @@ from flasgger import swag_from
 from ..examples_for_doc.car_api_examples import *
 from ..examples_for_doc.car_related_schemas import *
 from src.controllers.car_trips_controller import (
-    get_all_car_trips_by_id, get_car_route
+    get_all_car_trips_by_id, get_car_od_matrix, get_car_route, get_car_route_batch
 )
 
 car_trips_route = Blueprint('car_trips_route', __name__)
@@ -209,6 +209,15 @@ def all_trips_by_id():
             "type": "string",
             "required": True,
             "description": "End address (URL-encoded)"
+        },
+        {
+            "name": "engine",
+            "in": "query",
+            "type": "string",
+            "required": False,
+            "enum": ["ch", "dijkstra", "astar", "bidirectional_astar"],
+            "default": "ch",
+            "description": "Shortest-path engine used for the route and the flood detour. `ch` (contraction hierarchies) falls back to `dijkstra` when the hierarchies have not been built"
         }
     ],
     "responses": {
@@ -229,8 +238,93 @@ def all_trips_by_id():
         500: {
             "description": "Server error",
             "schema": {"type": "object", "properties": {"error": {"type": "string", "example": "Routing service failed"}}}
+        },
+        503: {
+            "description": "Too many route jobs queued in this worker; retry after the Retry-After delay",
+            "schema": {"type": "object", "properties": {"error": {"type": "string", "example": "Too many routes are being computed, try again shortly"}}}
+        },
+        504: {
+            "description": "The route search did not finish within ROUTE_TIMEOUT_S",
+            "schema": {"type": "object", "properties": {"error": {"type": "string", "example": "Route job did not finish within 30s"}}}
         }
     }
 })
 def car_route():
-    return get_car_route()
\ No newline at end of file
+    return get_car_route()
+
+@car_trips_route.route('/car_route/batch', methods=['POST'])
+@swag_from({
+    "tags": ["Car"],
+    "description": "Flood status and delay for many origin/destination pairs in one call. Points are snapped together and pairs sharing an origin share one search. Pairs that cannot be geocoded or routed get an `error` instead of failing the batch.",
+    "parameters": [
+        {
+            "name": "body",
+            "in": "body",
+            "required": True,
+            "schema": car_route_batch_request_schema,
+            "example": car_route_batch_request_example
+        }
+    ],
+    "responses": {
+        200: {
+            "description": "One result per pair, in request order",
+            "schema": car_route_batch_schema,
+            "examples": {"application/json": car_route_batch_example}
+        },
+        400: {
+            "description": "Missing or invalid pairs",
+            "schema": {"type": "object", "properties": {"error": {"type": "string", "example": "pairs must be a non-empty list"}}}
+        },
+        503: {
+            "description": "Too many route jobs queued in this worker; retry after the Retry-After delay",
+            "schema": {"type": "object", "properties": {"error": {"type": "string", "example": "Too many routes are being computed, try again shortly"}}}
+        },
+        504: {
+            "description": "The route search did not finish within ROUTE_TIMEOUT_S",
+            "schema": {"type": "object", "properties": {"error": {"type": "string", "example": "Route job did not finish within 30s"}}}
+        }
+    }
+})
+def car_route_batch():
+    return get_car_route_batch()
+
+@car_trips_route.route('/car_route/matrix', methods=['POST'])
+@swag_from({
+    "tags": ["Car"],
+    "description": "Normal vs flooded travel time between every origin and destination (e.g. one point per planning area). Each origin is one single-source search over the car network; origins are spread over the route worker processes.",
+    "parameters": [
+        {
+            "name": "body",
+            "in": "body",
+            "required": True,
+            "schema": car_od_matrix_request_schema,
+            "example": car_od_matrix_request_example
+        }
+    ],
+    "produces": ["application/json", "application/octet-stream"],
+    "responses": {
+        200: {
+            "description": "Dense matrices indexed [origin][destination] (JSON), or an .npz archive when format=npz",
+            "schema": car_od_matrix_schema,
+            "examples": {"application/json": car_od_matrix_example}
+        },
+        400: {
+            "description": "Missing or invalid origins, destinations, speed or format",
+            "schema": {"type": "object", "properties": {"error": {"type": "string", "example": "origins must be a non-empty list"}}}
+        },
+        404: {
+            "description": "An address could not be geocoded",
+            "schema": {"type": "object", "properties": {"error": {"type": "string"}}}
+        },
+        503: {
+            "description": "Too many route jobs in flight; retry shortly",
+            "schema": {"type": "object", "properties": {"error": {"type": "string"}}}
+        },
+        504: {
+            "description": "The matrix was not computed within OD_MATRIX_TIMEOUT_S",
+            "schema": {"type": "object", "properties": {"error": {"type": "string"}}}
+        }
+    }
+})
+def car_od_matrix():
+    return get_car_od_matrix()
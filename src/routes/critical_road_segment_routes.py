@@ -3,7 +3,7 @@ from flasgger import swag_from
 from ..examples_for_doc.critical_road_examples import *
 from ..examples_for_doc.critical_road_schemas import *
 from src.controllers.critical_road_controller import (
-    top_critical_segments, road_criticality)
+    top_critical_segments, road_criticality, road_name_suggestions)
 
 
 critical_roads_route = Blueprint("critical_road_segments", __name__)
@@ -23,6 +23,32 @@ critical_roads_route = Blueprint("critical_road_segments", __name__)
       "Maximum number of segments to return. \n"
       "Example: `/top_critical_segments?limit=3`"
   )
+  },
+  {
+    "name": "metric",
+    "in": "query",
+    "type": "string",
+    "required": False,
+    "enum": ["betweenness", "closeness"],
+    "default": "betweenness",
+    "description": "Centrality metric to rank segments by."
+  },
+  {
+    "name": "bbox",
+    "in": "query",
+    "type": "string",
+    "required": False,
+    "description": (
+      "Only segments intersecting this box (WGS84, `minx,miny,maxx,maxy`). \n"
+      "Example: `/top_critical_segments?limit=20&bbox=103.80,1.28,103.86,1.32`"
+  )
+  },
+  {
+    "name": "precision",
+    "in": "query",
+    "type": "integer",
+    "required": False,
+    "description": "Decimals kept in the coordinates (0-15). All of them by default."
   }
     ],
     "responses": {
@@ -54,6 +80,13 @@ def get_top_critical_segments():
             "`/road_criticality?road_name=simei`"
         ),
         "example": "simei"
+    },
+    {
+        "name": "precision",
+        "in": "query",
+        "type": "integer",
+        "required": False,
+        "description": "Decimals kept in the GeoJSON coordinates (0-15). All of them by default."
     }
                 ],
     "responses": {
@@ -78,3 +111,49 @@ def get_road_criticality():
     
     
     return road_criticality()
+
+
+@critical_roads_route.route("/road_criticality/autocomplete", methods=["GET"])
+@swag_from({
+    "tags": ["Critical Road Segments"],
+    "parameters": [
+    {
+        "name": "q",
+        "in": "query",
+        "type": "string",
+        "required": True,
+        "description": (
+            "Part of a road name (case-insensitive). Names starting with it come first.\n"
+            "Example usage:\n"
+            "`/road_criticality/autocomplete?q=sim`"
+        ),
+        "example": "sim"
+    },
+    {
+        "name": "limit",
+        "in": "query",
+        "type": "integer",
+        "required": False,
+        "default": 10,
+        "description": "Maximum number of names to return (max 50)."
+    }
+                ],
+    "responses": {
+        200: {
+            "description": "Road names to offer for road_criticality.",
+            "schema": road_name_suggestions_schema,
+            "examples": {"application/json": road_name_suggestions_example}
+        },
+        400: {
+            "description": "Missing q parameter.",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "error": {"type": "string", "example": "q is required"}
+                }
+            }
+        }
+    }
+})
+def get_road_name_suggestions():
+    return road_name_suggestions()
@@ -0,0 +1,179 @@
+from flask import Blueprint
+from flasgger import swag_from
+from src.controllers.system_controller import get_graph_stats, get_memory_report, get_route_worker_metrics, get_cache_stats
+
+
+system_route = Blueprint('system_route', __name__)
+
+@system_route.route('/system/graphs', methods=['GET'])
+@swag_from({
+    "tags": ["System"],
+    "description": "Load time and memory footprint of the road network graphs held by this worker process.",
+    "responses": {
+        200: {
+            "description": "Per-graph load statistics keyed by graph name (car, bus)",
+            "schema": {
+                "type": "object",
+                "additionalProperties": {
+                    "type": "object",
+                    "properties": {
+                        "loaded": {"type": "boolean", "description": "Whether the graph has been loaded in this process"},
+                        "path": {"type": "string", "description": "GraphML file the graph was loaded from"},
+                        "source": {"type": "string", "description": "graphml, or snapshot when a prebuilt binary snapshot was used"},
+                        "nodes": {"type": "integer"},
+                        "edges": {"type": "integer"},
+                        "load_seconds": {"type": "number", "description": "Wall time spent loading the graph"},
+                        "rss_delta_mb": {"type": "number", "description": "Growth of process RSS while loading (MB)"},
+                        "compact_loaded": {"type": "boolean", "description": "Whether the array-backed routing graph has been loaded"},
+                        "compact_mb": {"type": "number", "description": "Size of the array-backed routing graph (MB, memory-mapped when built from a snapshot)"}
+                    }
+                }
+            },
+            "examples": {
+                "application/json": {
+                    "bus": {"loaded": True, "path": "SG_bus_network.graphml", "source": "snapshot", "nodes": 44012, "edges": 91377, "load_seconds": 12.84, "rss_delta_mb": 612.4},
+                    "car": {"loaded": False}
+                }
+            }
+        }
+    }
+})
+def graph_stats_route():
+    return get_graph_stats()
+
+
+@system_route.route('/system/memory', methods=['GET'])
+@swag_from({
+    "tags": ["System"],
+    "description": (
+        "Shared vs private memory of the worker process that serves the request. "
+        "With PRELOAD_STATIC_DATA=1 most of the static data should show up as shared."
+    ),
+    "responses": {
+        200: {
+            "description": "Memory breakdown in MB from /proc/self/smaps_rollup",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "pid": {"type": "integer"},
+                    "rss_mb": {"type": "number", "description": "Resident set size"},
+                    "pss_mb": {"type": "number", "description": "Proportional set size (shared pages split between processes)"},
+                    "shared_mb": {"type": "number", "description": "Resident pages also mapped by other processes"},
+                    "private_mb": {"type": "number", "description": "Resident pages only this worker maps"},
+                    "gc_frozen_objects": {"type": "integer", "description": "Objects moved to the permanent GC generation before fork"}
+                }
+            },
+            "examples": {
+                "application/json": {"pid": 4182, "rss_mb": 2113.6, "pss_mb": 702.9, "shared_mb": 1874.2, "private_mb": 239.4, "gc_frozen_objects": 5123877}
+            }
+        },
+        501: {
+            "description": "Not running on Linux",
+            "schema": {"type": "object", "properties": {"error": {"type": "string", "example": "Memory report is only available on Linux"}}}
+        }
+    }
+})
+def memory_report_route():
+    return get_memory_report()
+
+
+@system_route.route('/system/route_workers', methods=['GET'])
+@swag_from({
+    "tags": ["System"],
+    "description": (
+        "Route worker pool of the process that serves the request: queue depth and job counters. "
+        "Car routes are computed in this pool so they do not block other requests."
+    ),
+    "responses": {
+        200: {
+            "description": "Pool configuration and counters since the process started",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "pid": {"type": "integer"},
+                    "workers": {"type": "integer", "description": "ROUTE_WORKERS (0 = routes run in the request thread)"},
+                    "pool_started": {"type": "boolean"},
+                    "in_flight": {"type": "integer", "description": "Jobs queued or running right now"},
+                    "max_pending": {"type": "integer", "description": "In-flight jobs above which requests get 503"},
+                    "timeout_s": {"type": "number"},
+                    "submitted": {"type": "integer"},
+                    "completed": {"type": "integer"},
+                    "failed": {"type": "integer"},
+                    "timed_out": {"type": "integer", "description": "Jobs the request stopped waiting for (504)"},
+                    "cancelled": {"type": "integer", "description": "Timed-out jobs removed from the queue before they started"},
+                    "rejected": {"type": "integer", "description": "Requests turned away because the queue was full (503)"},
+                    "pool_restarts": {"type": "integer"},
+                    "latency_ms_p50": {"type": "number"},
+                    "latency_ms_p95": {"type": "number"}
+                }
+            },
+            "examples": {
+                "application/json": {
+                    "pid": 4182, "workers": 2, "pool_started": True, "in_flight": 1, "max_pending": 8, "timeout_s": 30.0,
+                    "submitted": 1250, "completed": 1241, "failed": 2, "timed_out": 3, "cancelled": 1, "rejected": 4,
+                    "pool_restarts": 0, "latency_ms_p50": 182.4, "latency_ms_p95": 911.7
+                }
+            }
+        }
+    }
+})
+def route_worker_metrics_route():
+    return get_route_worker_metrics()
+
+
+@system_route.route('/system/caches', methods=['GET'])
+@swag_from({
+    "tags": ["System"],
+    "description": (
+        "Result caches of the process that serves the request. car_route holds /car_route results "
+        "per snapped origin/destination node pair and is dropped whenever the flood data changes; "
+        "geocode holds address lookups, and its sources count how many lookups were answered by the "
+        "cache, Google, a bus stop code or the offline stop/flood location names."
+    ),
+    "responses": {
+        200: {
+            "description": "Size and hit/miss counters per cache",
+            "schema": {
+                "type": "object",
+                "additionalProperties": {
+                    "type": "object",
+                    "properties": {
+                        "enabled": {"type": "boolean"},
+                        "entries": {"type": "integer", "description": "Entries held in this process's memory"},
+                        "max_entries": {"type": "integer"},
+                        "ttl_s": {"type": "number"},
+                        "store": {"type": "string", "description": "SQLite file shared by the workers, null if memory only"},
+                        "version": {"type": "string", "description": "Flood dataset version of the cached entries"},
+                        "hits": {"type": "integer", "description": "Served from this process's memory"},
+                        "store_hits": {"type": "integer", "description": "Served from the shared store"},
+                        "misses": {"type": "integer"},
+                        "expired": {"type": "integer"},
+                        "evictions": {"type": "integer"},
+                        "invalidations": {"type": "integer", "description": "Times the flood data changed and the cache was dropped"},
+                        "hit_ratio": {"type": "number"},
+                        "sources": {"type": "object", "description": "geocode only: lookups answered per source (cache, google, stop_code, offline, not_found)"}
+                    }
+                }
+            },
+            "examples": {
+                "application/json": {
+                    "car_route": {
+                        "enabled": True, "entries": 412, "max_entries": 2048, "ttl_s": 21600.0,
+                        "store": "/var/cache/fyp/routes.sqlite", "version": "3f9c2a71b0de",
+                        "hits": 1630, "store_hits": 214, "misses": 498, "expired": 12, "evictions": 0,
+                        "invalidations": 1, "hit_ratio": 0.7874
+                    },
+                    "geocode": {
+                        "entries": 530, "max_entries": 10000, "ttl_s": 2592000.0,
+                        "store": "graph_snapshots/geocode_cache.sqlite", "version": "",
+                        "hits": 3811, "store_hits": 96, "misses": 612, "expired": 0, "evictions": 0,
+                        "invalidations": 0, "hit_ratio": 0.8646,
+                        "sources": {"cache": 3907, "google": 571, "stop_code": 33, "offline": 4, "not_found": 4}
+                    }
+                }
+            }
+        }
+    }
+})
+def cache_stats_route():
+    return get_cache_stats()
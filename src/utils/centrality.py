@@ -0,0 +1,94 @@
+"""
+Edge centrality of the road network, as columns of the edge table.
+
+The centrality pickles (Gcar_edge_*_centrality.pkl) are dicts keyed by (u, v, key). Each is
+read once per process and turned into a float array aligned with the edge positions of a
+compact graph (0 for edges without a value), so attaching a metric to an edge table is a
+column assignment rather than a dict lookup per row.
+
+get_projected_edges() keeps the edge table of a graph in PROJECTED_CRS, with its centrality
+columns, next to the graph's edge STRtree (tree index = row), for buffer queries in metres.
+"""
+import pickle
+import threading
+import time
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+
+from src.utils.compact_graph import PROJECTED_CRS
+from src.utils.graph_registry import get_compact_graph
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+CENTRALITY_PKLS = {
+    "betweenness": ROOT_DIR / "Gcar_edge_betweenness_centrality.pkl",
+    "closeness": ROOT_DIR / "Gcar_edge_closeness_centrality.pkl",
+}
+
+_MAPS = {}
+_ARRAYS = {}
+_PROJECTED = {}
+_LOCK = threading.RLock()
+
+
+def load_centrality(metric: str):
+    """Centrality dict keyed by (u, v, key), loaded once. Raises FileNotFoundError if the pickle is missing."""
+    if metric not in CENTRALITY_PKLS:
+        raise ValueError("metric must be 'betweenness' or 'closeness'")
+    if metric not in _MAPS:
+        with _LOCK:
+            if metric not in _MAPS:
+                with open(CENTRALITY_PKLS[metric], "rb") as f:
+                    _MAPS[metric] = pickle.load(f)
+    return _MAPS[metric]
+
+
+def centrality_array(graph_name: str, metric: str):
+    """Float array of a metric per edge position of a registered graph, built once."""
+    key = (graph_name, metric)
+    if key in _ARRAYS:
+        return _ARRAYS[key]
+    with _LOCK:
+        if key in _ARRAYS:
+            return _ARRAYS[key]
+        start = time.perf_counter()
+        values = load_centrality(metric)
+        cg = get_compact_graph(graph_name)
+        ids = np.array(list(values.keys()), dtype=np.int64).reshape(-1, 3)
+        scores = np.fromiter(values.values(), dtype=np.float64, count=len(values))
+        # Keys beyond the graph's widest parallel-edge key cannot be edges of it
+        known = ids[:, 2] < cg._key_span
+        positions = cg.edge_positions(ids[known, 0], ids[known, 1], ids[known, 2])
+        found = positions >= 0
+
+        column = np.zeros(cg.number_of_edges(), dtype=np.float64)
+        column[positions[found]] = scores[known][found]
+        print(f"Centrality '{metric}' for {graph_name} graph: {int(found.sum())} of "
+              f"{cg.number_of_edges()} edges matched in {time.perf_counter() - start:.3f}s")
+        _ARRAYS[key] = column
+        return column
+
+
+def get_projected_edges(graph_name: str = "bus", metrics=("closeness",)):
+    """
+    (edges, tree): the edge table of a registered graph in PROJECTED_CRS with a column per
+    requested metric, and the STRtree over its geometries (tree index = row). Built once;
+    metric columns are added the first time they are asked for.
+    """
+    with _LOCK:
+        cached = _PROJECTED.get(graph_name)
+        if cached is None:
+            start = time.perf_counter()
+            cg = get_compact_graph(graph_name)
+            tree = cg.edge_strtree()
+            frame = cg.edge_frame()
+            edges = gpd.GeoDataFrame(frame.drop(columns="geometry"), geometry=tree.geometries, crs=PROJECTED_CRS)
+            print(f"Projected edge table for {graph_name} graph: {len(edges)} edges in "
+                  f"{time.perf_counter() - start:.3f}s")
+            cached = _PROJECTED[graph_name] = (edges, tree)
+        edges = cached[0]
+        for metric in metrics:
+            if metric not in edges.columns:
+                edges[metric] = centrality_array(graph_name, metric)
+        return cached
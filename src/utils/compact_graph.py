@@ -0,0 +1,313 @@
+"""
+Array-backed, read-only view of a road network for the routing hot path.
+
+A NetworkX MultiDiGraph keeps a dict per node, per neighbour and per edge; the same network
+as a handful of NumPy arrays (the graph snapshot layout, see graph_snapshot) is several
+times smaller and can be memory-mapped and shared between workers:
+
+    node_ids / node_x / node_y         OSM id and lon/lat per dense node index
+    indptr / targets / edge_keys       CSR adjacency, edges sorted by (source, target, key)
+    edge_length                        metres per edge
+    edge_name / edge_highway           codes into the names / highways tables (-1 = missing)
+    geom_offsets / geom_coords         every edge geometry in one flat coordinate buffer
+
+Edges are addressed by their position in these arrays. Lookups take and return arrays so a
+whole route is handled in a few vectorised calls instead of one dict access per edge.
+
+Snapping points to nodes or edges uses a KD-tree over the projected node coordinates and an
+STRtree over the projected edge geometries. Both are built on first use and kept with the
+graph, so every later request (and every worker forked after preload) reuses them.
+"""
+import geopandas as gpd
+import numpy as np
+import scipy.sparse as sp
+import shapely
+from pyproj import Transformer
+from scipy.spatial import cKDTree
+from shapely.geometry import LineString
+from shapely.strtree import STRtree
+
+from src.utils.graph_snapshot import ARRAY_FILES, graph_arrays, load_snapshot_arrays
+
+# Singapore SVY21, in metres: nearest-point queries are done here rather than in degrees
+PROJECTED_CRS = "EPSG:3414"
+_TO_PROJECTED = Transformer.from_crs("EPSG:4326", PROJECTED_CRS, always_xy=True)
+
+
+def project(lons, lats):
+    """x, y arrays in PROJECTED_CRS for lon/lat arrays."""
+    lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+    lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+    return _TO_PROJECTED.transform(lons, lats)
+
+
+class CompactGraph:
+    def __init__(self, arrays, names, highways):
+        for name in ARRAY_FILES:
+            setattr(self, name, arrays[name])
+        self.names = names
+        self.highways = highways
+
+        n_nodes = len(self.node_ids)
+        self.sources = np.repeat(np.arange(n_nodes, dtype=np.int32), np.diff(self.indptr))
+        # (source, target, key) packed into one sorted int64 so edge lookups are a searchsorted
+        self._key_span = int(self.edge_keys.max()) + 1 if len(self.edge_keys) else 1
+        self._edge_code = (
+            self.sources.astype(np.int64) * n_nodes + self.targets
+        ) * self._key_span + self.edge_keys
+
+        self._search_lists = None
+        self._matrices = {}
+        self._node_kdtree = None
+        self._edge_strtree = None
+
+    @classmethod
+    def from_snapshot(cls, name):
+        meta, arrays = load_snapshot_arrays(name)
+        return cls(arrays, meta["names"], meta["highways"])
+
+    @classmethod
+    def from_networkx(cls, G):
+        return cls(*graph_arrays(G))
+
+    def number_of_nodes(self):
+        return len(self.node_ids)
+
+    def number_of_edges(self):
+        return len(self.targets)
+
+    def nbytes(self):
+        """Bytes held by the arrays, including memory-mapped ones."""
+        arrays = [getattr(self, name) for name in ARRAY_FILES] + [self.sources, self._edge_code]
+        return sum(a.nbytes for a in arrays)
+
+    # ---- nodes ----
+
+    def node_index(self, nodes):
+        """Dense index of each OSM node id (-1 if not in the graph)."""
+        nodes = np.asarray(nodes, dtype=np.int64)
+        idx = np.searchsorted(self.node_ids, nodes).clip(0, len(self.node_ids) - 1)
+        return np.where(self.node_ids[idx] == nodes, idx, -1)
+
+    def node_kdtree(self):
+        """KD-tree over the node coordinates in PROJECTED_CRS, built once."""
+        if self._node_kdtree is None:
+            self._node_kdtree = cKDTree(np.column_stack(project(self.node_x, self.node_y)))
+        return self._node_kdtree
+
+    def nearest_nodes(self, lons, lats, return_dist=False):
+        """OSM id of the node nearest to each lon/lat point (and the distances in metres)."""
+        x, y = project(lons, lats)
+        dist, idx = self.node_kdtree().query(np.column_stack([x, y]))
+        nodes = self.node_ids[idx]
+        return (nodes, dist) if return_dist else nodes
+
+    # ---- edges ----
+
+    def edge_positions(self, u, v, key=0):
+        """
+        Position of edge (u, v, key) for arrays of OSM node ids (-1 where there is no such
+        edge), like G.get_edge_data(u, v, key) but for a whole route at once.
+        """
+        u_idx = self.node_index(u)
+        v_idx = self.node_index(v)
+        key = np.broadcast_to(np.asarray(key, dtype=np.int64), u_idx.shape)
+        code = (u_idx * len(self.node_ids) + v_idx) * self._key_span + key
+        pos = np.searchsorted(self._edge_code, code).clip(0, max(len(self._edge_code) - 1, 0))
+        found = (u_idx >= 0) & (v_idx >= 0) & (self._edge_code[pos] == code)
+        return np.where(found, pos, -1)
+
+    def cheapest_edge_positions(self, u, v, weights=None):
+        """
+        Position of the cheapest of the parallel edges u->v by weights (default: the edge
+        lengths) for arrays of OSM node ids, -1 where there is no edge. This is the edge a
+        search over weight_matrix(weights) travels between u and v.
+        """
+        weights = self.edge_length if weights is None else np.asarray(weights)
+        u_idx = self.node_index(u)
+        v_idx = self.node_index(v)
+        pair = u_idx.astype(np.int64) * len(self.node_ids) + v_idx
+        first = np.searchsorted(self._edge_code, pair * self._key_span)
+        count = np.searchsorted(self._edge_code, (pair + 1) * self._key_span) - first
+        count[(u_idx < 0) | (v_idx < 0)] = 0
+        best = np.where(count > 0, first, -1)
+        # Parallel edges are rare: compare each further key against the best so far
+        for k in range(1, int(count.max()) if len(count) else 0):
+            more = np.flatnonzero(count > k)
+            cost = np.nan_to_num(weights[first[more] + k], nan=np.inf)
+            cheaper = cost < np.nan_to_num(weights[best[more]], nan=np.inf)
+            best[more[cheaper]] = first[more[cheaper]] + k
+        return best
+
+    def edge_ids(self, positions):
+        """(u, v, key) OSM ids of the edges at positions."""
+        positions = np.asarray(positions)
+        return list(zip(
+            self.node_ids[self.sources[positions]].tolist(),
+            self.node_ids[self.targets[positions]].tolist(),
+            np.asarray(self.edge_keys)[positions].tolist(),
+        ))
+
+    def edge_strtree(self):
+        """STRtree over the edge geometries in PROJECTED_CRS (tree index = edge position), built once."""
+        if self._edge_strtree is None:
+            geoms = shapely.transform(self.edge_geometries(), lambda xy: np.column_stack(project(xy[:, 0], xy[:, 1])))
+            self._edge_strtree = STRtree(geoms)
+        return self._edge_strtree
+
+    def nearest_edges(self, lons, lats, return_dist=False):
+        """
+        Position of the edge nearest to each lon/lat point (and the distances in metres),
+        like ox.distance.nearest_edges but without rebuilding the index on every call.
+        """
+        x, y = project(lons, lats)
+        (point_idx, pos), dist = self.edge_strtree().query_nearest(
+            shapely.points(x, y), all_matches=True, return_distance=True
+        )
+        # Ties (typically the two directions of a road) go to the lowest edge position
+        order = np.lexsort((pos, point_idx))
+        point_idx, pos, dist = point_idx[order], pos[order], dist[order]
+        first = np.flatnonzero(np.r_[True, point_idx[1:] != point_idx[:-1]])
+        positions = np.empty(len(x), dtype=np.int64)
+        distances = np.empty(len(x))
+        positions[point_idx[first]] = pos[first]
+        distances[point_idx[first]] = dist[first]
+        return (positions, distances) if return_dist else positions
+
+    def edge_mask(self, edges):
+        """Boolean array over all edges, True for every (u, v, key) in edges."""
+        mask = np.zeros(self.number_of_edges(), dtype=bool)
+        edges = list(edges)
+        if edges:
+            u, v, k = np.array(edges, dtype=np.int64).T
+            pos = self.edge_positions(u, v, k)
+            mask[pos[pos >= 0]] = True
+        return mask
+
+    def edge_weights(self, penalized=None, factor=1.0):
+        """Edge lengths with the edges in the `penalized` mask multiplied by factor."""
+        if penalized is None:
+            return np.asarray(self.edge_length)
+        return np.where(penalized, self.edge_length * factor, self.edge_length)
+
+    def edge_names(self, positions, default=None):
+        return [self.names[c] if c >= 0 else default for c in self.edge_name[positions].tolist()]
+
+    def edge_highway_values(self, positions, default=None):
+        return [self.highways[c] if c >= 0 else default for c in self.edge_highway[positions].tolist()]
+
+    def edge_geometry(self, pos):
+        """Geometry of the edge at pos, or the straight segment between its nodes if it has none."""
+        start, end = self.geom_offsets[pos], self.geom_offsets[pos + 1]
+        if end > start:
+            return shapely.linestrings(np.asarray(self.geom_coords[start:end]))
+        u, v = self.sources[pos], self.targets[pos]
+        return LineString([(self.node_x[u], self.node_y[u]), (self.node_x[v], self.node_y[v])])
+
+    def edge_geometries(self, positions=None):
+        """Shapely array of edge geometries (straight segments where an edge has none)."""
+        positions = np.arange(self.number_of_edges()) if positions is None else np.asarray(positions)
+        counts = self.geom_offsets[positions + 1] - self.geom_offsets[positions]
+        # Edges without a geometry get their two end nodes
+        n_points = np.where(counts > 0, counts, 2)
+        line_of_point = np.repeat(np.arange(len(positions)), n_points)
+        offset = np.arange(n_points.sum()) - np.repeat(np.cumsum(n_points) - n_points, n_points)
+        edge = positions[line_of_point]
+        from_geom = counts[line_of_point] > 0
+        coord_idx = np.where(from_geom, self.geom_offsets[edge] + offset, 0)
+        node = np.where(offset == 0, self.sources[edge], self.targets[edge])
+        coords = self.geom_coords[coord_idx] if len(self.geom_coords) else np.zeros((len(edge), 2))
+        xy = np.where(
+            from_geom[:, None],
+            coords,
+            np.column_stack([self.node_x[node], self.node_y[node]]),
+        )
+        return shapely.linestrings(xy, indices=line_of_point)
+
+    def edge_frame(self):
+        """
+        GeoDataFrame with one row per edge (u, v, key, name, highway, length, geometry) in
+        array order, like ox.graph_to_gdfs(G, nodes=False).reset_index() without the
+        attributes the controllers never read.
+        """
+        return gpd.GeoDataFrame(
+            {
+                "u": self.node_ids[self.sources],
+                "v": self.node_ids[self.targets],
+                "key": np.asarray(self.edge_keys, dtype=np.int64),
+                "name": self.edge_names(slice(None)),
+                "highway": self.edge_highway_values(slice(None)),
+                "length": np.asarray(self.edge_length),
+            },
+            geometry=self.edge_geometries(),
+            crs="EPSG:4326",
+        )
+
+    def route_coords(self, node_route, weights=None):
+        """
+        [lat, lon] points along a node route: every edge geometry without its last vertex
+        (the node itself for edges without geometry), then the final node. Between parallel
+        edges the cheapest by weights is followed, as in route_edges.
+        """
+        nodes = self.node_index(node_route)
+        pos = self.route_edges(node_route, weights)
+        safe = pos.clip(0)
+        counts = np.where(pos >= 0, self.geom_offsets[safe + 1] - self.geom_offsets[safe], 0)
+        n_points = np.where(counts > 0, counts - 1, 1)
+        edge_of_point = np.repeat(np.arange(len(pos)), n_points)
+        offset = np.arange(n_points.sum()) - np.repeat(np.cumsum(n_points) - n_points, n_points)
+        from_geom = counts[edge_of_point] > 0
+        coord_idx = np.where(from_geom, self.geom_offsets[safe[edge_of_point]] + offset, 0)
+        u = nodes[:-1][edge_of_point]
+        coords = self.geom_coords[coord_idx] if len(self.geom_coords) else np.zeros((len(u), 2))
+        xy = np.where(from_geom[:, None], coords, np.column_stack([self.node_x[u], self.node_y[u]]))
+        xy = np.vstack([xy, [[self.node_x[nodes[-1]], self.node_y[nodes[-1]]]]])
+        return xy[:, ::-1].tolist()
+
+    def route_edges(self, node_route, weights=None):
+        """
+        Positions of the edges along a node route (-1 where missing): between parallel edges,
+        the cheapest by weights (default: the edge lengths), which is the one searched over.
+        """
+        return self.cheapest_edge_positions(node_route[:-1], node_route[1:], weights)
+
+    # ---- searching ----
+
+    def weight_matrix(self, weights=None):
+        """
+        Sparse adjacency matrix (dense node index -> dense node index) with the cheapest of
+        any parallel edges, for scipy.sparse.csgraph. Zero-length edges stay explicit.
+        """
+        weights = self.edge_weights() if weights is None else np.asarray(weights)
+        n_nodes = self.number_of_nodes()
+        if not len(weights):
+            return sp.csr_matrix((n_nodes, n_nodes))
+        pair = self.sources.astype(np.int64) * n_nodes + self.targets
+        first = np.flatnonzero(np.r_[True, pair[1:] != pair[:-1]])
+        cheapest = np.minimum.reduceat(weights, first)
+        indptr = np.searchsorted(first, self.indptr)
+        return sp.csr_matrix((cheapest, self.targets[first], indptr), shape=(n_nodes, n_nodes))
+
+    def length_matrix(self, reverse=False):
+        """weight_matrix() for the edge lengths (of the reversed graph if reverse), built once."""
+        if reverse not in self._matrices:
+            matrix = self.weight_matrix()
+            self._matrices[reverse] = matrix.T.tocsr() if reverse else matrix
+        return self._matrices[reverse]
+
+    def search_lists(self):
+        """
+        (indptr, targets, edge_length) as plain lists for the Python search loops, where
+        NumPy scalars are slow. Built on first use, so processes that never run such a
+        search do not hold a copy.
+        """
+        if self._search_lists is None:
+            self._search_lists = (self.indptr.tolist(), self.targets.tolist(), self.edge_length.tolist())
+        return self._search_lists
+
+    def out_edges(self, node):
+        """(targets, edge positions) of a dense node index, as Python lists."""
+        indptr, targets, _ = self.search_lists()
+        start, end = indptr[node], indptr[node + 1]
+        return targets[start:end], range(start, end)
+
@@ -0,0 +1,392 @@
+"""
+Contraction hierarchies (CH) over the car network for fast `length`-weighted shortest paths.
+
+Nodes are contracted one by one in order of importance. A shortcut u->w is added for every
+path u->v->w through the contracted node v unless a witness path avoiding v is at least as
+short. A query is then a bidirectional Dijkstra that only climbs to higher-ranked nodes,
+settling a few hundred nodes instead of a large part of the island. Shortcuts are unpacked
+back into the original node path.
+
+Two hierarchies are built per graph:
+- "base":  every node contracted; answers unpenalised queries.
+- "flood": endpoints of flood-exposed edges (see flood_exposure) are left uncontracted as a
+           core at the top of the hierarchy, so no shortcut ever contains an exposed edge and
+           witnesses are checked with exposed edges at their penalised weight. Penalising any
+           subset of exposed edges is then just re-weighting those core arcs (customize()),
+           with no rebuild, and queries stay exact.
+
+Build offline (rebuild whenever the graph or the flood dataset changes):
+    python -m src.utils.contraction_hierarchy
+"""
+import json
+import math
+import threading
+import time
+from heapq import heapify, heappop, heappush
+
+import numpy as np
+
+from src.utils.flood_exposure import (
+    FLOOD_PENALTY_FACTOR, artifact_path, flood_dataset_version, get_flood_exposure,
+)
+from src.utils.graph_registry import get_compact_graph
+
+# Witness searches give up after settling this many nodes (and then keep the shortcut).
+# Priority estimates use the smaller limit; it only affects the ordering, not correctness.
+WITNESS_SETTLE_LIMIT = 500
+SIMULATION_SETTLE_LIMIT = 50
+
+_HIERARCHIES = {}
+_LOCK = threading.Lock()
+
+
+def _witness_distances(out_upper, source, excluded, targets, max_cost, settle_limit):
+    """Upper-bound distances from source to targets, avoiding the node being contracted."""
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    remaining = set(targets)
+    settled = 0
+    while heap and remaining and settled < settle_limit:
+        d, x = heappop(heap)
+        if d > dist[x]:
+            continue
+        if d > max_cost:
+            break
+        settled += 1
+        remaining.discard(x)
+        for y, cost in out_upper[x].items():
+            if y == excluded:
+                continue
+            nd = d + cost
+            if nd < dist.get(y, math.inf):
+                dist[y] = nd
+                heappush(heap, (nd, y))
+    return dist
+
+
+def _needed_shortcuts(v, in_arcs, out_arcs, out_upper, lower, upper, settle_limit=WITNESS_SETTLE_LIMIT):
+    """Shortcuts (u, w, lower, upper, first_arc, second_arc) required to contract v."""
+    shortcuts = []
+    outs = list(out_arcs[v].items())
+    if not outs:
+        return shortcuts
+    for u, u_arcs in in_arcs[v].items():
+        targets = [w for w, _ in outs if w != u]
+        if not targets:
+            continue
+        max_cost = min(lower[a] for a in u_arcs) + max(min(lower[b] for b in w_arcs) for w, w_arcs in outs)
+        witness = _witness_distances(out_upper, u, v, targets, max_cost, settle_limit)
+        for w, w_arcs in outs:
+            if w == u:
+                continue
+            combos = sorted(
+                (lower[a] + lower[b], upper[a] + upper[b], a, b) for a in u_arcs for b in w_arcs
+            )
+            witness_cost = witness.get(w, math.inf)
+            best_upper = math.inf
+            for lo, up, a, b in combos:
+                # Keep the combo unless something is never worse than it under any penalty set
+                if witness_cost <= lo or best_upper <= lo:
+                    continue
+                shortcuts.append((u, w, lo, up, a, b))
+                best_upper = min(best_upper, up)
+    return shortcuts
+
+
+def build_contraction_hierarchy(cg, penalizable_edges=frozenset(), penalty_factor=FLOOD_PENALTY_FACTOR):
+    """
+    Contract a CompactGraph. Endpoints of penalizable_edges, the (u, v, key) that customize() may penalise,
+    are kept uncontracted in the core.
+    """
+    start = time.perf_counter()
+    node_ids = np.asarray(cg.node_ids)
+    node_list = node_ids.tolist()
+    index = {n: i for i, n in enumerate(node_list)}
+    n_nodes = len(node_ids)
+
+    tail, head, lower, upper, first, second, edge_key = [], [], [], [], [], [], []
+    out_arcs = [dict() for _ in range(n_nodes)]
+    in_arcs = [dict() for _ in range(n_nodes)]
+    # Cheapest upper-bound weight to each out-neighbour, for the witness searches
+    out_upper = [dict() for _ in range(n_nodes)]
+
+    def add_arc(t, h, lo, up, a=-1, b=-1, key=-1):
+        existing = out_arcs[t].get(h, [])
+        if any(upper[e] <= lo for e in existing):
+            return
+        arc = len(tail)
+        tail.append(t)
+        head.append(h)
+        lower.append(lo)
+        upper.append(up)
+        first.append(a)
+        second.append(b)
+        edge_key.append(key)
+        kept = [e for e in existing if up > lower[e]]
+        out_arcs[t][h] = kept + [arc]
+        in_arcs[h][t] = out_arcs[t][h]
+        out_upper[t][h] = min(upper[e] for e in out_arcs[t][h])
+
+    lengths = np.nan_to_num(cg.edge_length, nan=1.0).tolist()
+    for s, t, k, length in zip(cg.sources.tolist(), cg.targets.tolist(), cg.edge_keys.tolist(), lengths):
+        if s == t:
+            continue
+        factor = penalty_factor if (node_list[s], node_list[t], k) in penalizable_edges else 1
+        add_arc(s, t, length, length * factor, key=k)
+    n_base_arcs = len(tail)
+
+    core = {index[n] for u, v, _ in penalizable_edges for n in (u, v) if n in index}
+    contracted = np.zeros(n_nodes, dtype=bool)
+    deleted_neighbours = np.zeros(n_nodes, dtype=np.int64)
+
+    def priority(v):
+        degree = sum(len(a) for a in in_arcs[v].values()) + sum(len(a) for a in out_arcs[v].values())
+        added = len(_needed_shortcuts(v, in_arcs, out_arcs, out_upper, lower, upper, SIMULATION_SETTLE_LIMIT))
+        return added - degree + deleted_neighbours[v]
+
+    heap = [(priority(v), v) for v in range(n_nodes) if v not in core]
+    heapify(heap)
+    rank = np.empty(n_nodes, dtype=np.int64)
+    up_lists = [[] for _ in range(n_nodes)]
+    down_lists = [[] for _ in range(n_nodes)]
+    next_rank = 0
+
+    while heap:
+        _, v = heappop(heap)
+        if contracted[v]:
+            continue
+        # Lazy update: re-evaluate and requeue if v is no longer the cheapest node
+        p = priority(v)
+        if heap and p > heap[0][0]:
+            heappush(heap, (p, v))
+            continue
+
+        for u, w, lo, up, a, b in _needed_shortcuts(v, in_arcs, out_arcs, out_upper, lower, upper):
+            add_arc(u, w, lo, up, a, b)
+
+        rank[v] = next_rank
+        next_rank += 1
+        contracted[v] = True
+        for w, arcs in out_arcs[v].items():
+            up_lists[v].extend(arcs)
+            del in_arcs[w][v]
+        for u, arcs in in_arcs[v].items():
+            down_lists[v].extend(arcs)
+            del out_arcs[u][v]
+            del out_upper[u][v]
+        # Neighbours get more expensive to contract; their priority is refreshed lazily when popped
+        for x in set(out_arcs[v]) | set(in_arcs[v]):
+            deleted_neighbours[x] += 1
+        out_arcs[v] = {}
+        in_arcs[v] = {}
+        out_upper[v] = {}
+
+    # The core sits above every contracted node; its arcs are searched in both directions
+    for v in sorted(core):
+        rank[v] = next_rank
+        next_rank += 1
+        for arcs in out_arcs[v].values():
+            up_lists[v].extend(arcs)
+        for arcs in in_arcs[v].values():
+            down_lists[v].extend(arcs)
+
+    def csr(lists):
+        indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum([len(l) for l in lists], out=indptr[1:])
+        arcs = np.fromiter((a for l in lists for a in l), dtype=np.int64, count=int(indptr[-1]))
+        return indptr, arcs
+
+    up_indptr, up_arcs = csr(up_lists)
+    down_indptr, down_arcs = csr(down_lists)
+    ch = ContractionHierarchy(
+        node_ids=node_ids,
+        rank=rank,
+        tail=np.array(tail, dtype=np.int64),
+        head=np.array(head, dtype=np.int64),
+        first=np.array(first, dtype=np.int64),
+        second=np.array(second, dtype=np.int64),
+        edge_key=np.array(edge_key, dtype=np.int64),
+        base_weight=np.array(lower, dtype=np.float64),
+        penalizable_edges=np.array(sorted(penalizable_edges), dtype=np.int64).reshape(-1, 3),
+        up_indptr=up_indptr, up_arcs=up_arcs,
+        down_indptr=down_indptr, down_arcs=down_arcs,
+        meta={"penalty_factor": penalty_factor, "core_nodes": len(core)},
+    )
+    print(f"Built contraction hierarchy in {time.perf_counter() - start:.1f}s: {n_nodes} nodes "
+          f"({len(core)} in core), {n_base_arcs} edges, {len(tail) - n_base_arcs} shortcuts")
+    return ch
+
+
+class ContractionHierarchy:
+    ARRAYS = (
+        "node_ids", "rank", "tail", "head", "first", "second", "edge_key", "base_weight",
+        "penalizable_edges", "up_indptr", "up_arcs", "down_indptr", "down_arcs",
+    )
+
+    def __init__(self, meta=None, **arrays):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.meta = meta or {}
+        self._index = {n: i for i, n in enumerate(self.node_ids.tolist())}
+        self._node_list = self.node_ids.tolist()
+        # Plain lists are much faster than NumPy scalars inside the Python search loops
+        self._head = self.head.tolist()
+        self._tail = self.tail.tolist()
+        self._first = self.first.tolist()
+        self._second = self.second.tolist()
+        self._base_weight = self.base_weight.tolist()
+        self._up = [self.up_arcs[s:e].tolist() for s, e in zip(self.up_indptr[:-1], self.up_indptr[1:])]
+        self._down = [self.down_arcs[s:e].tolist() for s, e in zip(self.down_indptr[:-1], self.down_indptr[1:])]
+
+        base = np.flatnonzero(self.first < 0)
+        self._edge_arc = {
+            (self._node_list[self._tail[a]], self._node_list[self._head[a]], int(self.edge_key[a])): int(a)
+            for a in base
+        }
+        self._penalizable_edges = set(map(tuple, self.penalizable_edges.tolist()))
+
+    def save(self, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, meta=np.array(json.dumps(self.meta)),
+                 **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(meta=json.loads(str(data["meta"])), **{name: data[name] for name in cls.ARRAYS})
+
+    def has_node(self, node):
+        return node in self._index
+
+    def customize(self, penalized_edges):
+        """
+        {arc: weight} overlay on the base arc weights, with the given edges (u, v, key)
+        multiplied by the flood penalty. Penalisable edges are core arcs that no shortcut is
+        built from, so only their own weights change. Returns None if an edge was not
+        penalisable at build time, since the hierarchy is then not guaranteed to be exact
+        (callers should fall back).
+        """
+        overlay = {}
+        factor = self.meta.get("penalty_factor", FLOOD_PENALTY_FACTOR)
+        for edge in penalized_edges:
+            if edge not in self._penalizable_edges:
+                return None
+            arc = self._edge_arc.get(edge)
+            if arc is not None:
+                # Missing arcs were dominated by a parallel edge under every penalty set
+                overlay[arc] = self._base_weight[arc] * factor
+        return overlay
+
+    def _unpack(self, arc, out):
+        stack = [arc]
+        while stack:
+            a = stack.pop()
+            if self._first[a] < 0:
+                out.append(self._head[a])
+            else:
+                stack.append(self._second[a])
+                stack.append(self._first[a])
+
+    def shortest_path(self, orig, dest, overlay=None, stats=None):
+        """
+        Node path from orig to dest (OSM node ids), or None if dest is unreachable, with arc
+        weights from overlay (see customize()) where given and the base weights elsewhere.
+        If a stats dict is given, the number of nodes settled is recorded in it.
+        """
+        base = self._base_weight
+        overlay = overlay or {}
+        s, t = self._index[orig], self._index[dest]
+        if s == t:
+            return [orig]
+
+        searches = (
+            ({s: 0.0}, {s: -1}, [(0.0, s)], self._up, self._head),
+            ({t: 0.0}, {t: -1}, [(0.0, t)], self._down, self._tail),
+        )
+        best, meeting = math.inf, None
+        settled = 0
+        active = [True, True]
+        side = 0
+        while active[0] or active[1]:
+            if not active[side]:
+                side = 1 - side
+            dist, parent, heap, arcs_of, endpoint = searches[side]
+            if not heap or heap[0][0] >= best:
+                active[side] = False
+                side = 1 - side
+                continue
+            d, x = heappop(heap)
+            if d > dist[x]:
+                continue
+            settled += 1
+            other = searches[1 - side][0].get(x)
+            if other is not None and d + other < best:
+                best, meeting = d + other, x
+            for a in arcs_of[x]:
+                y = endpoint[a]
+                nd = d + overlay.get(a, base[a])
+                if nd < dist.get(y, math.inf):
+                    dist[y] = nd
+                    parent[y] = a
+                    heappush(heap, (nd, y))
+            side = 1 - side
+
+        if stats is not None:
+            stats["settled"] = settled
+        if meeting is None:
+            return None
+
+        forward_arcs = []
+        x = meeting
+        while searches[0][1][x] != -1:
+            a = searches[0][1][x]
+            forward_arcs.append(a)
+            x = self._tail[a]
+        path = [s]
+        for a in reversed(forward_arcs):
+            self._unpack(a, path)
+        x = meeting
+        while searches[1][1][x] != -1:
+            a = searches[1][1][x]
+            self._unpack(a, path)
+            x = self._head[a]
+        return [self._node_list[i] for i in path]
+
+
+def _hierarchy_path(graph_name, kind):
+    # The base hierarchy does not depend on the flood dataset
+    version = flood_dataset_version() if kind == "flood" else "base"
+    return artifact_path(graph_name, f"ch_{kind}", version)
+
+
+def get_contraction_hierarchy(graph_name: str = "car", kind: str = "base"):
+    """
+    The prebuilt hierarchy ("base" or "flood") for the current graph and flood dataset, or
+    None if it has not been built (callers fall back to NetworkX). Loaded once per process.
+    """
+    path = _hierarchy_path(graph_name, kind)
+    cached = _HIERARCHIES.get((graph_name, kind))
+    if cached and cached[0] == path:
+        return cached[1]
+    with _LOCK:
+        cached = _HIERARCHIES.get((graph_name, kind))
+        if cached and cached[0] == path:
+            return cached[1]
+        ch = None
+        if path.exists():
+            start = time.perf_counter()
+            ch = ContractionHierarchy.load(path)
+            print(f"Loaded {graph_name} {kind} contraction hierarchy in {time.perf_counter() - start:.2f}s")
+        else:
+            print(f"No {kind} contraction hierarchy at {path.name}; routing falls back to NetworkX")
+        _HIERARCHIES[(graph_name, kind)] = (path, ch)
+        return ch
+
+
+if __name__ == "__main__":
+    import sys
+
+    for name in sys.argv[1:] or ["car"]:
+        cg = get_compact_graph(name)
+        build_contraction_hierarchy(cg).save(_hierarchy_path(name, "base"))
+        build_contraction_hierarchy(cg, set(get_flood_exposure(name))).save(_hierarchy_path(name, "flood"))
@@ -0,0 +1,98 @@
+"""
+Nearest road edge of every flood event.
+
+The flood endpoints all describe a flood by the road edge nearest to its point. Flood
+points are static, so the edge is looked up once per flood when the flood data is loaded
+and kept in a table indexed by flood_id:
+
+    lat, lon                 flood point
+    u, v, key                nearest edge of the graph
+    road_name, road_type     edge name / highway ("Unknown" if missing)
+    length_m                 edge length (0 if missing)
+    has_geometry             whether the edge has its own geometry in the graph
+    geometry                 edge LineString (the straight segment if it has none)
+    distance_m               flood point to edge distance
+
+When flood_events_rows.csv changes only the floods that are new, or whose point moved,
+are snapped again; the rows of the others are kept.
+"""
+import threading
+import time
+
+import pandas as pd
+
+from src.utils.flood_table import flood_dataset_version, get_flood_table
+from src.utils.graph_registry import get_compact_graph
+
+_INDEX = {}
+_LOCK = threading.Lock()
+
+
+def build_flood_edge_rows(cg, floods):
+    """Index rows for the floods of a flood table; floods without a point are skipped."""
+    floods = floods[floods["point"].notna()]
+    if floods.empty:
+        return pd.DataFrame(columns=[
+            "lat", "lon", "u", "v", "key", "road_name", "road_type", "length_m",
+            "has_geometry", "geometry", "distance_m", "geom",
+        ], index=pd.Index([], name="flood_id"))
+
+    positions, distances = cg.nearest_edges(floods["lon"].to_numpy(), floods["lat"].to_numpy(), return_dist=True)
+    u, v, key = zip(*cg.edge_ids(positions))
+    lengths = cg.edge_length[positions]
+    return pd.DataFrame({
+        "lat": floods["lat"].to_numpy(),
+        "lon": floods["lon"].to_numpy(),
+        "u": u,
+        "v": v,
+        "key": key,
+        "road_name": cg.edge_names(positions, default="Unknown"),
+        "road_type": cg.edge_highway_values(positions, default="Unknown"),
+        "length_m": pd.Series(lengths).fillna(0).to_numpy(),
+        "has_geometry": (cg.geom_offsets[positions + 1] > cg.geom_offsets[positions]),
+        "geometry": list(cg.edge_geometries(positions)),
+        "distance_m": distances,
+        # Source WKB, to tell on reload which points moved
+        "geom": floods["geom"].to_numpy(),
+    }, index=floods.index)
+
+
+def get_flood_edge_index(graph_name: str = "bus"):
+    """Flood edge table of a registered graph for the current flood dataset, built or updated on demand."""
+    version = flood_dataset_version()
+    cached = _INDEX.get(graph_name)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    with _LOCK:
+        cached = _INDEX.get(graph_name)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        start = time.perf_counter()
+        floods = get_flood_table().drop_duplicates(subset="flood_id", keep="first").set_index("flood_id")
+
+        previous = cached[1] if cached else None
+        if previous is not None:
+            same = previous["geom"].reindex(floods.index) == floods["geom"]
+            kept = previous.loc[same[same].index]
+            changed = floods[~same]
+        else:
+            kept = None
+            changed = floods
+
+        rows = build_flood_edge_rows(get_compact_graph(graph_name), changed)
+        table = rows if kept is None else pd.concat([kept, rows])
+        table = table.reindex([i for i in floods.index if i in table.index])
+        print(f"Flood edge index for {graph_name} graph (flood data {version}): {len(rows)} of "
+              f"{len(floods)} floods snapped in {time.perf_counter() - start:.3f}s")
+
+        _INDEX[graph_name] = (version, table)
+        return table
+
+
+def flood_edges(flood_ids, graph_name: str = "bus"):
+    """{flood_id: row dict} for the given ids that are in the index."""
+    table = get_flood_edge_index(graph_name)
+    found = table.loc[table.index.intersection(pd.Index(flood_ids))]
+    return {flood_id: row for flood_id, row in zip(found.index.tolist(), found.to_dict("records"))}
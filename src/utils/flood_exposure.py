@@ -0,0 +1,133 @@
+"""
+Per-edge flood exposure for a road network.
+
+Whether an edge intersects a flood buffer only changes when the flood dataset (or the
+graph) changes, so it is computed once for every edge and kept as a table keyed by
+(u, v, key) with the ids of the intersecting floods and the distance to the nearest one.
+The table is saved next to the graph snapshots and rebuilt automatically when
+flood_events_rows.csv changes.
+"""
+import hashlib
+import threading
+import time
+
+import geopandas as gpd
+import numpy as np
+from shapely.strtree import STRtree
+
+from src.utils.flood_table import flood_dataset_version, get_flood_table
+from src.utils.graph_registry import get_compact_graph, graph_source_stamp
+from src.utils.graph_snapshot import SNAPSHOT_DIR
+
+FLOOD_BUFFER_DEG = 0.00090
+# Weight multiplier for flooded edges when searching for a detour
+FLOOD_PENALTY_FACTOR = 1000
+
+_EXPOSURE = {}
+_MASKS = {}
+_LOCK = threading.Lock()
+
+
+def build_flood_exposure(cg, flood_ids, flood_points):
+    """
+    Tag every edge of a CompactGraph that intersects a flood buffer.
+    Returns {(u, v, key): {"flood_ids": [...], "distance_m": float}}.
+    """
+    edge_ids = cg.edge_ids(np.arange(cg.number_of_edges()))
+    edge_geoms = cg.edge_geometries()
+
+    buffers = gpd.GeoSeries(flood_points).buffer(FLOOD_BUFFER_DEG)
+    edge_idx, flood_idx = STRtree(buffers.values).query(edge_geoms, predicate="intersects")
+
+    # Distances in metres, measured in SVY21 for the intersecting pairs only
+    hit_edges = gpd.GeoSeries(edge_geoms[edge_idx], crs="EPSG:4326").to_crs(epsg=3414)
+    hit_floods = gpd.GeoSeries([flood_points[i] for i in flood_idx], crs="EPSG:4326").to_crs(epsg=3414)
+    distances = hit_edges.distance(hit_floods, align=False).to_numpy()
+
+    exposure = {}
+    for e, f, d in zip(edge_idx.tolist(), flood_idx.tolist(), distances.tolist()):
+        entry = exposure.setdefault(edge_ids[e], {"flood_ids": [], "distance_m": d})
+        entry["flood_ids"].append(int(flood_ids[f]))
+        entry["distance_m"] = min(entry["distance_m"], d)
+    return exposure
+
+
+def artifact_path(graph_name, kind, version):
+    """Path of a file precomputed from a graph and a flood dataset version, e.g. kind="flood_exposure"."""
+    digest = hashlib.sha1(f"{version}:{graph_source_stamp(graph_name)}".encode()).hexdigest()[:12]
+    return SNAPSHOT_DIR / f"{graph_name}_{kind}_{digest}.npz"
+
+
+def _save_sidecar(path, exposure):
+    rows = [(u, v, k, fid, entry["distance_m"])
+            for (u, v, k), entry in exposure.items() for fid in entry["flood_ids"]]
+    u, v, k, fid, dist = zip(*rows) if rows else ([], [], [], [], [])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(path, u=np.array(u, dtype=np.int64), v=np.array(v, dtype=np.int64),
+             key=np.array(k, dtype=np.int64), flood_id=np.array(fid, dtype=np.int64),
+             distance_m=np.array(dist, dtype=np.float64))
+
+
+def _load_sidecar(path):
+    data = np.load(path)
+    exposure = {}
+    for u, v, k, fid, d in zip(data["u"].tolist(), data["v"].tolist(), data["key"].tolist(),
+                               data["flood_id"].tolist(), data["distance_m"].tolist()):
+        entry = exposure.setdefault((u, v, k), {"flood_ids": [], "distance_m": d})
+        entry["flood_ids"].append(fid)
+    return exposure
+
+
+def _load_flood_points():
+    floods = get_flood_table()
+    floods = floods[floods["point"].notna()]
+    return floods["flood_id"].tolist(), floods["point"].tolist()
+
+
+def get_flood_exposure(graph_name: str = "car"):
+    """
+    Flood exposure table for a registered graph, for the current flood dataset.
+    Cached per process; loaded from the sidecar file when present, otherwise built and saved.
+    """
+    version = flood_dataset_version()
+    cached = _EXPOSURE.get(graph_name)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    with _LOCK:
+        cached = _EXPOSURE.get(graph_name)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        path = artifact_path(graph_name, "flood_exposure", version)
+        start = time.perf_counter()
+        if path.exists():
+            exposure = _load_sidecar(path)
+            source = "sidecar"
+        else:
+            flood_ids, flood_points = _load_flood_points()
+            exposure = build_flood_exposure(get_compact_graph(graph_name), flood_ids, flood_points)
+            try:
+                _save_sidecar(path, exposure)
+            except OSError as e:
+                print(f"Warning: could not save flood exposure table to {path}: {e}")
+            source = "built"
+        print(f"Flood exposure for {graph_name} graph ({source}, flood data {version}): "
+              f"{len(exposure)} flooded edges in {time.perf_counter() - start:.2f}s")
+
+        _EXPOSURE[graph_name] = (version, exposure)
+        return exposure
+
+
+def get_flood_edge_mask(graph_name: str = "car"):
+    """
+    Boolean array over the edges of the compact graph, True where the edge is in the flood
+    exposure table. Cached per flood dataset version like the table itself.
+    """
+    exposure = get_flood_exposure(graph_name)
+    cached = _MASKS.get(graph_name)
+    if cached and cached[0] is exposure:
+        return cached[1]
+    mask = get_compact_graph(graph_name).edge_mask(exposure)
+    _MASKS[graph_name] = (exposure, mask)
+    return mask
@@ -0,0 +1,72 @@
+"""
+The flood dataset (flood_events_rows.csv) as a typed in-memory table.
+
+Flood points are stored as hex WKB in the CSV. They are decoded once per dataset version,
+in one vectorised call, instead of with wkb.loads(bytes.fromhex(...)) for every row of
+every request. The table has the CSV columns (with "date" as datetime64) plus:
+
+    point      shapely Point per flood (None where the WKB could not be parsed)
+    lon, lat   float coordinates of the point (NaN where it could not be parsed)
+"""
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+import shapely
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+FLOOD_CSV = ROOT_DIR / "flood_events_rows.csv"
+# Columns added to the CSV ones; left out where rows are returned as they are in the CSV
+DERIVED_COLUMNS = ["point", "lon", "lat"]
+
+_TABLE = {}
+_VERSION_CACHE = {}
+_LOCK = threading.Lock()
+
+
+def flood_dataset_version(path=FLOOD_CSV) -> str:
+    """Content hash of the flood dataset; only re-hashed when the file's size or mtime changes."""
+    stat = os.stat(path)
+    stamp = (stat.st_size, stat.st_mtime_ns)
+    cached = _VERSION_CACHE.get(str(path))
+    if cached and cached[0] == stamp:
+        return cached[1]
+    with open(path, "rb") as f:
+        version = hashlib.sha1(f.read()).hexdigest()[:12]
+    _VERSION_CACHE[str(path)] = (stamp, version)
+    return version
+
+
+def load_flood_table(path=FLOOD_CSV):
+    df = pd.read_csv(path)
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    points = shapely.from_wkb(df["geom"].fillna("").to_numpy(dtype=object), on_invalid="ignore")
+    invalid = int((shapely.is_missing(points) & df["geom"].notna()).sum())
+    if invalid:
+        print(f"Warning: could not parse the geom of {invalid} flood events")
+    df["point"] = points
+    df["lon"] = shapely.get_x(points)
+    df["lat"] = shapely.get_y(points)
+    return df
+
+
+def get_flood_table():
+    """Flood table for the current flood dataset, loaded once per version."""
+    version = flood_dataset_version()
+    cached = _TABLE.get("floods")
+    if cached and cached[0] == version:
+        return cached[1]
+    with _LOCK:
+        cached = _TABLE.get("floods")
+        if cached and cached[0] == version:
+            return cached[1]
+        start = time.perf_counter()
+        table = load_flood_table()
+        print(f"Loaded flood table (flood data {version}): {len(table)} events in "
+              f"{time.perf_counter() - start:.3f}s")
+        _TABLE["floods"] = (version, table)
+        return table
@@ -0,0 +1,260 @@
+"""
+Address geocoding with a persistent cache and an offline fallback.
+
+Every address a user types goes through Google's geocoder, which costs a network round
+trip and an API call. Results are cached by normalised address in a SharedLRUCache backed
+by SQLite, so all workers (and restarts) reuse them. Bus stop codes, and when Google has
+no answer or cannot be reached, bus stop names from stops.txt and flooded location names
+from flood_events_rows.csv, are resolved locally without any network call.
+
+    GEOCODE_CACHE_SIZE   addresses kept per process (default 10000)
+    GEOCODE_CACHE_TTL_S  seconds a cached address is reused (default 30 days)
+    GEOCODE_CACHE_DB     SQLite file shared by all workers (default graph_snapshots/geocode_cache.sqlite,
+                         empty for memory only)
+
+geocode_addresses() looks up several addresses at once: cache misses are sent concurrently
+from a thread pool (the Google client keeps its HTTP connections alive between them) under
+one timeout for the whole set, so a start/end pair costs one round trip instead of two.
+
+    GEOCODE_THREADS      concurrent Google requests per process (default 8)
+    GEOCODE_TIMEOUT_S    time budget for one geocode_addresses() call (default 10)
+    GEOCODER             "stub" answers every address locally with a fixed delay instead of
+                         calling Google (for offline benchmarks; nothing is persisted)
+    GEOCODE_STUB_MS      delay of the stub geocoder in milliseconds (default 100)
+"""
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+import googlemaps
+import pandas as pd
+from dotenv import load_dotenv
+
+from src.utils.flood_table import get_flood_table
+from src.utils.graph_snapshot import SNAPSHOT_DIR
+from src.utils.shared_cache import SharedLRUCache
+
+load_dotenv()
+ROOT_DIR = Path(__file__).resolve().parents[2]
+STOPS_TXT = ROOT_DIR / "stops.txt"
+
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "10000"))
+GEOCODE_CACHE_TTL_S = float(os.getenv("GEOCODE_CACHE_TTL_S", str(30 * 24 * 3600)))
+GEOCODE_CACHE_DB = os.getenv("GEOCODE_CACHE_DB", str(SNAPSHOT_DIR / "geocode_cache.sqlite")) or None
+GEOCODE_THREADS = int(os.getenv("GEOCODE_THREADS", "8"))
+GEOCODE_TIMEOUT_S = float(os.getenv("GEOCODE_TIMEOUT_S", "10"))
+GEOCODER = os.getenv("GEOCODER", "google")
+GEOCODE_STUB_MS = float(os.getenv("GEOCODE_STUB_MS", "100"))
+
+_GMAPS = None
+_POOL = None
+_CACHE = None
+_OFFLINE = None
+_LOCK = threading.Lock()
+_SOURCES = Counter()
+_SOURCES_LOCK = threading.Lock()
+
+
+def normalize_address(address):
+    """Case- and whitespace-insensitive form of an address, used as the cache key."""
+    return re.sub(r"\s+", " ", str(address)).strip().strip(",.").casefold()
+
+
+def _gmaps_client():
+    global _GMAPS
+    if _GMAPS is None:
+        # Bounded, so a hung request cannot hold a GEOCODE_THREADS thread indefinitely
+        _GMAPS = googlemaps.Client(
+            os.getenv("GOOGLE_MAPS_API_KEY"), timeout=GEOCODE_TIMEOUT_S, retry_timeout=GEOCODE_TIMEOUT_S
+        )
+    return _GMAPS
+
+
+def get_geocode_cache():
+    global _CACHE
+    if _CACHE is None:
+        # Stub results must never reach the shared store
+        db_path = GEOCODE_CACHE_DB if GEOCODER != "stub" else None
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        _CACHE = SharedLRUCache("geocode", GEOCODE_CACHE_SIZE, GEOCODE_CACHE_TTL_S, db_path)
+    return _CACHE
+
+
+def _get_pool():
+    global _POOL
+    if _POOL is None:
+        with _LOCK:
+            if _POOL is None:
+                _POOL = ThreadPoolExecutor(max_workers=GEOCODE_THREADS, thread_name_prefix="geocode")
+    return _POOL
+
+
+def _offline_index():
+    """
+    ({stop code: point}, {normalised name: point}) from the local GTFS stops and flood
+    records. Where a name occurs more than once the first occurrence wins.
+    """
+    global _OFFLINE
+    if _OFFLINE is not None:
+        return _OFFLINE
+    with _LOCK:
+        if _OFFLINE is not None:
+            return _OFFLINE
+        codes, names = {}, {}
+        try:
+            stops = pd.read_csv(STOPS_TXT, dtype={"stop_code": str})
+            for code, name, lat, lon in zip(stops["stop_code"], stops["stop_name"], stops["stop_lat"], stops["stop_lon"]):
+                point = {"lat": float(lat), "lon": float(lon)}
+                codes.setdefault(str(code).strip(), point)
+                names.setdefault(normalize_address(name), point)
+        except (OSError, KeyError) as e:
+            print(f"Warning: could not load bus stops for offline geocoding: {e}")
+        try:
+            floods = get_flood_table()
+            floods = floods[floods["point"].notna()]
+            for name, lat, lon in zip(floods["flooded_location"], floods["lat"], floods["lon"]):
+                names.setdefault(normalize_address(name), {"lat": float(lat), "lon": float(lon)})
+        except (OSError, KeyError) as e:
+            print(f"Warning: could not load flood locations for offline geocoding: {e}")
+        _OFFLINE = (codes, names)
+        return _OFFLINE
+
+
+def _stop_code_point(key):
+    codes = _offline_index()[0]
+    if key.isdigit():
+        return codes.get(key) or codes.get(key.zfill(5))
+    return codes.get(key.upper())
+
+
+def _stub_point(address):
+    """Deterministic point inside Singapore for any address, after GEOCODE_STUB_MS."""
+    time.sleep(GEOCODE_STUB_MS / 1000)
+    digest = hashlib.sha1(normalize_address(address).encode()).digest()
+    return {
+        'lat': 1.24 + 0.22 * digest[0] / 255,
+        'lon': 103.62 + 0.38 * digest[1] / 255,
+    }
+
+
+def _google_point(address):
+    if GEOCODER == "stub":
+        return _stub_point(address)
+    result = _gmaps_client().geocode(address)
+    if not result:
+        return None
+    location = result[0]['geometry']['location']
+    return {'lat': location['lat'], 'lon': location['lng']}
+
+
+def _count(source):
+    with _SOURCES_LOCK:
+        _SOURCES[source] += 1
+
+
+def _cached_point(key):
+    point = get_geocode_cache().get(key)
+    if point is not None:
+        _count("cache")
+    return point
+
+
+def _lookup(address, key):
+    """Resolve an address that is not cached, and cache the result."""
+    # A bus stop code is unambiguous locally, and Google would read it as a partial postcode
+    point = _stop_code_point(key)
+    source = "stop_code"
+    if point is None:
+        try:
+            point = _google_point(address)
+            source = GEOCODER
+        except (ValueError, googlemaps.exceptions.ApiError, googlemaps.exceptions.TransportError,
+                googlemaps.exceptions.Timeout) as e:
+            # ValueError: no API key configured
+            print(f"Warning: Google geocoding failed for {address!r}, trying offline: {e}")
+    if point is None:
+        point = _offline_index()[1].get(key)
+        source = "offline"
+
+    if point is None:
+        _count("not_found")
+        return None
+    _count(source)
+    get_geocode_cache().put(key, point)
+    return point
+
+
+def geocode_address(address):
+    """{'lat', 'lon'} of an address, or None if it cannot be found."""
+    key = normalize_address(address)
+    if not key:
+        return None
+    point = _cached_point(key)
+    return point if point is not None else _lookup(address, key)
+
+
+def geocode_addresses(addresses, timeout=None):
+    """
+    {address: {'lat', 'lon'} or None} for several addresses, looked up concurrently.
+    Addresses still unresolved when the shared timeout runs out are left out of the result.
+    """
+    timeout = GEOCODE_TIMEOUT_S if timeout is None else timeout
+    points = {}
+    pending = {}
+    for address in dict.fromkeys(addresses):
+        key = normalize_address(address)
+        if not key:
+            points[address] = None
+            continue
+        point = _cached_point(key)
+        if point is not None:
+            points[address] = point
+        else:
+            pending[address] = key
+
+    if pending:
+        pool = _get_pool()
+        futures = {pool.submit(_lookup, address, key): address for address, key in pending.items()}
+        done, not_done = wait(futures, timeout=timeout)
+        for future in done:
+            try:
+                points[futures[future]] = future.result()
+            except Exception as e:
+                print(f"Warning: geocoding {futures[future]!r} failed: {e}")
+                points[futures[future]] = None
+        for future in not_done:
+            # A request already sent cannot be aborted; its result still lands in the cache
+            future.cancel()
+            _count("timed_out")
+    return points
+
+
+def geocode_stats():
+    """Cache counters plus how many lookups each source answered."""
+    with _SOURCES_LOCK:
+        sources = dict(_SOURCES)
+    return {**get_geocode_cache().stats(), "geocoder": GEOCODER, "sources": sources}
+
+
+if __name__ == "__main__":
+    # Sequential vs concurrent lookups, e.g. GEOCODER=stub python -m src.utils.geocoding 20
+    n_addresses = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    addresses = [f"{i} Benchmark Road, Singapore" for i in range(n_addresses)]
+    run = time.time_ns()
+
+    start = time.perf_counter()
+    for address in addresses:
+        geocode_address(f"{address} #{run}-a")
+    print(f"sequential: {n_addresses} addresses in {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    geocode_addresses([f"{address} #{run}-b" for address in addresses])
+    print(f"concurrent: {n_addresses} addresses in {time.perf_counter() - start:.3f}s "
+          f"({GEOCODE_THREADS} threads)")
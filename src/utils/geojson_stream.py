@@ -0,0 +1,80 @@
+"""
+Streaming GeoJSON FeatureCollections.
+
+Building a list of feature dicts with mapping(geometry) per row and jsonify-ing it holds
+the whole collection in memory several times over before the first byte is sent. Here the
+geometries of all features are serialised in one vectorised GEOS call (shapely.to_geojson),
+optionally rounded to a number of decimals first, and the collection is written out in
+chunks of features from a generator, so the client starts receiving features right away.
+
+Properties are encoded with orjson when it is installed, and the standard json module
+otherwise. GEOJSON_CHUNK_FEATURES sets how many features go into one chunk (default 200).
+"""
+import json
+import os
+
+import numpy as np
+import shapely
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+GEOJSON_CHUNK_FEATURES = int(os.getenv("GEOJSON_CHUNK_FEATURES", "200"))
+# Most decimals accepted for coordinates (7 is already ~1 cm in longitude/latitude)
+MAX_PRECISION = 15
+
+
+def dumps(value) -> bytes:
+    """Compact JSON bytes of plain Python values."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def geometry_json(geometries, precision=None):
+    """GeoJSON geometry strings for an array of shapely geometries, coordinates rounded to precision decimals."""
+    geometries = np.asarray(geometries, dtype=object)
+    if precision is not None:
+        geometries = shapely.transform(geometries, lambda coords: np.round(coords, precision))
+    return shapely.to_geojson(geometries).tolist()
+
+
+def iter_feature_collection(properties, feature_properties, geometry_strings):
+    """
+    Chunks (bytes) of a FeatureCollection with collection-level properties and one feature
+    per (properties dict, GeoJSON geometry string) pair.
+    """
+    yield b'{"type":"FeatureCollection","properties":' + dumps(properties) + b',"features":['
+    chunk = []
+    for i, (props, geom) in enumerate(zip(feature_properties, geometry_strings)):
+        chunk.append(
+            (b"," if i else b"") + b'{"type":"Feature","properties":' + dumps(props)
+            + b',"geometry":' + geom.encode() + b"}"
+        )
+        if len(chunk) >= GEOJSON_CHUNK_FEATURES:
+            yield b"".join(chunk)
+            chunk = []
+    if chunk:
+        yield b"".join(chunk)
+    yield b"]}"
+
+
+def feature_collection_response(properties, feature_properties, geometries, precision=None):
+    """Streaming Flask response for a FeatureCollection of features with these properties and geometries."""
+    # Geometries are encoded before the response starts, so errors still reach the caller
+    geometry_strings = geometry_json(geometries, precision)
+    return Response(
+        iter_feature_collection(properties, feature_properties, geometry_strings),
+        mimetype="application/json",
+    )
+
+
+def precision_arg(value):
+    """Coordinate decimals from a query string value: None (full precision) when missing or invalid."""
+    try:
+        return min(max(int(value), 0), MAX_PRECISION)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+import networkx as nx
+import osmnx as ox
+
+from src.utils.compact_graph import CompactGraph
+from src.utils.graph_snapshot import load_snapshot, snapshot_is_fresh
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+
+GRAPH_PATHS = {
+    "car": ROOT_DIR / "SG_car_network.graphml",
+    "bus": ROOT_DIR / "SG_bus_network.graphml",
+}
+
+# One instance per graph per process, loaded on first use
+_GRAPHS = {}
+_GRAPH_STATS = {}
+_COMPACT_GRAPHS = {}
+_LOCK = threading.Lock()
+
+
+def _current_rss_bytes():
+    """Resident set size of this process in bytes (Linux), or None if unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return None
+
+
+def graph_source_stamp(name: str) -> str:
+    """Size and mtime of the GraphML file registered under `name`, to tag data derived from it."""
+    path = GRAPH_PATHS[name]
+    if not path.exists():
+        return "nosource"
+    stat = os.stat(path)
+    return f"{stat.st_size}-{int(stat.st_mtime)}"
+
+
+def get_graph(name: str):
+    """
+    Return the shared, read-only graph registered under `name` ("car" or "bus").
+    The graph is loaded once per process, from its binary snapshot when one has been
+    built for the current GraphML file, otherwise from the GraphML itself.
+    """
+    G = _GRAPHS.get(name)
+    if G is not None:
+        return G
+
+    if name not in GRAPH_PATHS:
+        raise ValueError(f"Unknown graph '{name}'. Expected one of: {', '.join(GRAPH_PATHS)}")
+
+    with _LOCK:
+        # Another thread may have finished loading while we waited
+        G = _GRAPHS.get(name)
+        if G is not None:
+            return G
+
+        path = GRAPH_PATHS[name]
+        rss_before = _current_rss_bytes()
+        start = time.perf_counter()
+        if snapshot_is_fresh(name, path):
+            source = "snapshot"
+            G = load_snapshot(name)
+        else:
+            source = "graphml"
+            G = ox.load_graphml(path)
+        load_seconds = time.perf_counter() - start
+        rss_after = _current_rss_bytes()
+
+        # Controllers share this instance, so guard against structural changes
+        G = nx.freeze(G)
+
+        _GRAPH_STATS[name] = {
+            "path": str(path),
+            "source": source,
+            "nodes": G.number_of_nodes(),
+            "edges": G.number_of_edges(),
+            "load_seconds": round(load_seconds, 3),
+            "rss_delta_mb": (
+                round((rss_after - rss_before) / 1024 ** 2, 1)
+                if rss_before is not None and rss_after is not None else None
+            ),
+        }
+        _GRAPHS[name] = G
+        print(
+            f"Loaded {name} graph from {path.name} ({source}): {_GRAPH_STATS[name]['nodes']} nodes, "
+            f"{_GRAPH_STATS[name]['edges']} edges in {_GRAPH_STATS[name]['load_seconds']}s "
+            f"(+{_GRAPH_STATS[name]['rss_delta_mb']} MB RSS)"
+        )
+        return G
+
+
+def get_compact_graph(name: str):
+    """
+    Array-backed version of the graph registered under `name` (see compact_graph), for the
+    routing hot path. Memory-mapped from the snapshot when it is fresh; otherwise built
+    once from the GraphML, without keeping the NetworkX graph (only the astar engines
+    need that, through get_graph).
+    """
+    cg = _COMPACT_GRAPHS.get(name)
+    if cg is not None:
+        return cg
+
+    if name not in GRAPH_PATHS:
+        raise ValueError(f"Unknown graph '{name}'. Expected one of: {', '.join(GRAPH_PATHS)}")
+
+    with _LOCK:
+        cg = _COMPACT_GRAPHS.get(name)
+        if cg is not None:
+            return cg
+        start = time.perf_counter()
+        if snapshot_is_fresh(name, GRAPH_PATHS[name]):
+            source = "snapshot"
+            cg = CompactGraph.from_snapshot(name)
+        else:
+            source = "graph"
+    if cg is None:
+        G = _GRAPHS.get(name)
+        cg = CompactGraph.from_networkx(G if G is not None else ox.load_graphml(GRAPH_PATHS[name]))
+    print(f"Loaded compact {name} graph ({source}): {cg.number_of_nodes()} nodes, "
+          f"{cg.number_of_edges()} edges, {cg.nbytes() / 1024 ** 2:.1f} MB of arrays "
+          f"in {time.perf_counter() - start:.3f}s")
+    _COMPACT_GRAPHS.setdefault(name, cg)
+    return _COMPACT_GRAPHS[name]
+
+
+def graph_stats():
+    """Load time and memory footprint of every graph loaded so far in this process."""
+    return {
+        name: dict(
+            _GRAPH_STATS.get(name, {}),
+            loaded=name in _GRAPHS,
+            compact_loaded=name in _COMPACT_GRAPHS,
+            compact_mb=(
+                round(_COMPACT_GRAPHS[name].nbytes() / 1024 ** 2, 1) if name in _COMPACT_GRAPHS else None
+            ),
+        )
+        for name in GRAPH_PATHS
+    }
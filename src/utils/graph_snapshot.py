@@ -0,0 +1,229 @@
+"""
+Binary snapshots of the road network graphs.
+
+`ox.load_graphml` re-parses XML and rebuilds every shapely geometry from WKT on each
+boot. A snapshot stores the same network as flat NumPy arrays that can be memory-mapped:
+
+    graph_snapshots/<name>/
+        meta.json          graph attributes, source file fingerprint, name/highway tables
+        node_ids.npy       int64, sorted OSM node ids (position = dense node index)
+        node_x.npy         float64 lon per node
+        node_y.npy         float64 lat per node
+        indptr.npy         int64, CSR offsets into the edge arrays (len = nodes + 1)
+        targets.npy        int32, dense index of each edge's target node
+        edge_keys.npy      int32, multigraph key of each edge
+        edge_length.npy    float64, edge length in metres
+        edge_name.npy      int32, index into meta["names"] (-1 = no name)
+        edge_highway.npy   int32, index into meta["highways"] (-1 = no highway tag)
+        geom_offsets.npy   int64, offsets into geom_coords per edge (len = edges + 1);
+                           an empty slice means the edge has no geometry attribute
+        geom_coords.npy    float64 (points, 2), x/y of every edge geometry vertex
+
+Build offline with:
+    python -m src.utils.graph_snapshot car bus
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+import osmnx as ox
+import shapely
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+SNAPSHOT_DIR = ROOT_DIR / "graph_snapshots"
+FORMAT_VERSION = 1
+
+ARRAY_FILES = (
+    "node_ids", "node_x", "node_y", "indptr", "targets", "edge_keys",
+    "edge_length", "edge_name", "edge_highway", "geom_offsets", "geom_coords",
+)
+
+
+def snapshot_path(name: str) -> Path:
+    return SNAPSHOT_DIR / name
+
+
+def _source_fingerprint(source: Path):
+    stat = source.stat()
+    return {"source": source.name, "source_size": stat.st_size, "source_mtime": int(stat.st_mtime)}
+
+
+def _encode(table: dict, value):
+    """Intern a JSON-serialisable attribute value and return its table index."""
+    if value is None:
+        return -1
+    key = json.dumps(value, sort_keys=True)
+    if key not in table:
+        table[key] = len(table)
+    return table[key]
+
+
+def graph_arrays(G):
+    """
+    Flatten a MultiDiGraph into the snapshot arrays (see the module docstring).
+    Returns (arrays, names, highways), the last two being the attribute value tables.
+    """
+    node_ids = np.array(sorted(G.nodes), dtype=np.int64)
+    node_x = np.array([G.nodes[n]["x"] for n in node_ids], dtype=np.float64)
+    node_y = np.array([G.nodes[n]["y"] for n in node_ids], dtype=np.float64)
+
+    edges = list(G.edges(keys=True, data=True))
+    u_idx = np.searchsorted(node_ids, np.array([u for u, _, _, _ in edges], dtype=np.int64))
+    v_idx = np.searchsorted(node_ids, np.array([v for _, v, _, _ in edges], dtype=np.int64))
+    keys = np.array([k for _, _, k, _ in edges], dtype=np.int32)
+
+    # CSR order: by source node, then target node, then key
+    order = np.lexsort((keys, v_idx, u_idx))
+    indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(u_idx, minlength=len(node_ids)), out=indptr[1:])
+
+    names, highways = {}, {}
+    edge_length = np.empty(len(edges), dtype=np.float64)
+    edge_name = np.empty(len(edges), dtype=np.int32)
+    edge_highway = np.empty(len(edges), dtype=np.int32)
+    geom_offsets = np.zeros(len(edges) + 1, dtype=np.int64)
+    coords = []
+    for pos, i in enumerate(order):
+        data = edges[i][3]
+        edge_length[pos] = data.get("length", np.nan)
+        edge_name[pos] = _encode(names, data.get("name"))
+        edge_highway[pos] = _encode(highways, data.get("highway"))
+        geom = data.get("geometry")
+        n_points = 0
+        if geom is not None:
+            xy = shapely.get_coordinates(geom)
+            coords.append(xy)
+            n_points = len(xy)
+        geom_offsets[pos + 1] = geom_offsets[pos] + n_points
+
+    arrays = {
+        "node_ids": node_ids,
+        "node_x": node_x,
+        "node_y": node_y,
+        "indptr": indptr,
+        "targets": v_idx[order].astype(np.int32),
+        "edge_keys": keys[order],
+        "edge_length": edge_length,
+        "edge_name": edge_name,
+        "edge_highway": edge_highway,
+        "geom_offsets": geom_offsets,
+        "geom_coords": np.vstack(coords) if coords else np.empty((0, 2), dtype=np.float64),
+    }
+    return (
+        arrays,
+        [json.loads(k) for k in sorted(names, key=names.get)],
+        [json.loads(k) for k in sorted(highways, key=highways.get)],
+    )
+
+
+def build_snapshot(name: str, source: Path):
+    """Convert a GraphML network into a snapshot directory. Returns the snapshot path."""
+    start = time.perf_counter()
+    G = ox.load_graphml(source)
+    arrays, names, highways = graph_arrays(G)
+
+    out_dir = snapshot_path(name)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for array_name, array in arrays.items():
+        np.save(out_dir / f"{array_name}.npy", array)
+
+    meta = {
+        "format_version": FORMAT_VERSION,
+        **_source_fingerprint(Path(source)),
+        "graph_attrs": {k: v for k, v in G.graph.items() if isinstance(v, (str, int, float, bool))},
+        "names": names,
+        "highways": highways,
+    }
+    # meta.json is written last so a half-written snapshot is never picked up
+    with open(out_dir / "meta.json", "w") as f:
+        json.dump(meta, f)
+
+    print(f"Built {name} snapshot in {time.perf_counter() - start:.1f}s: "
+          f"{len(arrays['node_ids'])} nodes, {len(arrays['targets'])} edges -> {out_dir}")
+    return out_dir
+
+
+def snapshot_is_fresh(name: str, source: Path) -> bool:
+    """True if a snapshot exists and was built from the current source file (or the source is absent)."""
+    meta_path = snapshot_path(name) / "meta.json"
+    if not meta_path.exists():
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("format_version") != FORMAT_VERSION:
+        return False
+    if not Path(source).exists():
+        return True
+    fingerprint = _source_fingerprint(Path(source))
+    return all(meta.get(k) == v for k, v in fingerprint.items())
+
+
+def load_snapshot_arrays(name: str):
+    """Memory-map the snapshot arrays. Pages are backed by the files and shared between processes."""
+    directory = snapshot_path(name)
+    with open(directory / "meta.json") as f:
+        meta = json.load(f)
+    arrays = {
+        array_name: np.load(directory / f"{array_name}.npy", mmap_mode="r")
+        for array_name in ARRAY_FILES
+    }
+    return meta, arrays
+
+
+def load_snapshot(name: str):
+    """
+    Rebuild a MultiDiGraph from a snapshot with only the attributes the controllers use:
+    node x/y and edge length, name, highway and geometry. This is a full Python graph;
+    only the NetworkX routing engines (astar, bidirectional_astar) need it.
+    """
+    meta, a = load_snapshot_arrays(name)
+    names, highways = meta["names"], meta["highways"]
+
+    node_ids = a["node_ids"].tolist()
+    sources = np.repeat(np.arange(len(node_ids)), np.diff(a["indptr"])).tolist()
+    targets = a["targets"].tolist()
+    keys = a["edge_keys"].tolist()
+    lengths = a["edge_length"].tolist()
+    name_codes = a["edge_name"].tolist()
+    highway_codes = a["edge_highway"].tolist()
+
+    # Build every edge geometry in one vectorised call
+    offsets = np.asarray(a["geom_offsets"])
+    counts = np.diff(offsets)
+    has_geom = np.flatnonzero(counts > 0)
+    geoms = [None] * len(targets)
+    if len(has_geom):
+        line_index = np.repeat(np.arange(len(has_geom)), counts[has_geom])
+        lines = shapely.linestrings(np.asarray(a["geom_coords"]), indices=line_index)
+        for i, line in zip(has_geom.tolist(), lines):
+            geoms[i] = line
+
+    G = nx.MultiDiGraph(**meta["graph_attrs"])
+    G.add_nodes_from(
+        (n, {"x": x, "y": y})
+        for n, x, y in zip(node_ids, a["node_x"].tolist(), a["node_y"].tolist())
+    )
+
+    def edge_rows():
+        for i, (s, t, k) in enumerate(zip(sources, targets, keys)):
+            data = {"length": lengths[i]}
+            if name_codes[i] >= 0:
+                data["name"] = names[name_codes[i]]
+            if highway_codes[i] >= 0:
+                data["highway"] = highways[highway_codes[i]]
+            if geoms[i] is not None:
+                data["geometry"] = geoms[i]
+            yield node_ids[s], node_ids[t], k, data
+
+    G.add_edges_from(edge_rows())
+    return G
+
+
+if __name__ == "__main__":
+    from src.utils.graph_registry import GRAPH_PATHS
+
+    for graph_name in sys.argv[1:] or list(GRAPH_PATHS):
+        build_snapshot(graph_name, GRAPH_PATHS[graph_name])
@@ -0,0 +1,99 @@
+"""
+Origin/destination matrices over the compact car graph.
+
+One scipy Dijkstra per origin gives the shortest-path length to every node together with
+the shortest-path tree. The flooded length along every tree path is then summed for all
+nodes at once by pointer jumping, so an origin costs one search and a few array passes
+however many destinations there are. Origins are split into at most ROUTE_WORKERS jobs of
+the route pool (see route_worker), so a matrix gets the same queue limit and timeout as
+route searches, and its processes share the graph arrays loaded before they were forked.
+
+    OD_MATRIX_TIMEOUT_S  seconds a matrix request waits for its jobs (default 120)
+"""
+import math
+import os
+
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+from src.utils.graph_registry import get_compact_graph
+from src.utils.preload import warm_route_data
+from src.utils.route_worker import ROUTE_MAX_PENDING, ROUTE_WORKERS, run_route_jobs
+
+# Fewer origins than this are not worth a job of their own
+ORIGINS_PER_TASK = 8
+OD_MATRIX_TIMEOUT_S = float(os.getenv("OD_MATRIX_TIMEOUT_S", "120"))
+
+
+def path_sums(predecessors, values):
+    """
+    For every node of a shortest-path tree (scipy predecessors, -9999 at the root and at
+    unreachable nodes), the sum of `values` over the node and all its ancestors.
+    """
+    total = np.array(values, dtype=np.float64)
+    parent = np.array(predecessors)
+    active = np.flatnonzero(parent >= 0)
+    # Each round doubles the length of the path already summed
+    while len(active):
+        total[active] += total[parent[active]]
+        parent[active] = parent[parent[active]]
+        active = active[parent[active] >= 0]
+    return total
+
+
+def _tree_edge_values(cg, predecessors, edge_values):
+    """
+    edge_values of the tree edge into each node (0 at the root and unreachable nodes). Between
+    parallel edges the tree uses the shortest, as length_matrix() does.
+    """
+    values = np.zeros(len(predecessors), dtype=np.float64)
+    child = np.flatnonzero(predecessors >= 0)
+    pos = cg.cheapest_edge_positions(cg.node_ids[predecessors[child]], cg.node_ids[child])
+    values[child] = np.where(pos >= 0, edge_values[pos.clip(0)], 0.0)
+    return values
+
+
+def _origin_rows(graph_name, origins, dest_idx, flooded_positions):
+    """Length and flooded length rows from each origin index to the destination indexes."""
+    cg = get_compact_graph(graph_name)
+    flooded_length = np.zeros(cg.number_of_edges(), dtype=np.float64)
+    flooded_length[flooded_positions] = np.nan_to_num(cg.edge_length[flooded_positions])
+    dist, predecessors = dijkstra(cg.length_matrix(), indices=origins, return_predecessors=True)
+    dist = np.atleast_2d(dist)
+    predecessors = np.atleast_2d(predecessors)
+    flooded = np.vstack([
+        path_sums(row, _tree_edge_values(cg, row, flooded_length)) for row in predecessors
+    ])
+    return dist[:, dest_idx], flooded[:, dest_idx]
+
+
+def od_matrix(graph_name, orig_nodes, dest_nodes, flood_mask, workers=None, timeout=None):
+    """
+    Shortest-path length and the flooded length along that path for every origin x
+    destination (OSM node ids) of a registered graph. Returns float arrays "length_m" and
+    "flooded_length_m" of shape (origins, destinations), inf / nan where a destination is
+    unreachable. workers caps the number of jobs, which never exceeds ROUTE_WORKERS.
+    Raises RouteQueueFull / RouteTimeout like run_route_jobs.
+    """
+    cg = get_compact_graph(graph_name)
+    orig_idx = cg.node_index(orig_nodes)
+    dest_idx = cg.node_index(dest_nodes)
+    if (orig_idx < 0).any() or (dest_idx < 0).any():
+        raise ValueError("All origins and destinations must be nodes of the graph")
+
+    n_jobs = min(ROUTE_WORKERS, ROUTE_MAX_PENDING, math.ceil(len(orig_idx) / ORIGINS_PER_TASK))
+    if workers is not None:
+        n_jobs = min(n_jobs, workers)
+    chunks = np.array_split(orig_idx, max(n_jobs, 1))
+    flooded_positions = np.flatnonzero(flood_mask)
+    rows = run_route_jobs(
+        _origin_rows,
+        [(graph_name, chunk, dest_idx, flooded_positions) for chunk in chunks],
+        timeout=OD_MATRIX_TIMEOUT_S if timeout is None else timeout,
+        warm_up=warm_route_data,
+    )
+
+    length = np.vstack([r[0] for r in rows]) if rows else np.empty((0, len(dest_idx)))
+    flooded = np.vstack([r[1] for r in rows]) if rows else np.empty((0, len(dest_idx)))
+    flooded[~np.isfinite(length)] = math.nan
+    return {"length_m": length, "flooded_length_m": flooded, "workers": len(chunks)}
@@ -0,0 +1,93 @@
+import gc
+import os
+import time
+
+
+def warm_route_data():
+    """Load everything the route and matrix jobs need, so route processes forked afterwards share it."""
+    from src.utils.contraction_hierarchy import get_contraction_hierarchy
+    from src.utils.flood_exposure import get_flood_edge_mask
+    from src.utils.graph_registry import get_compact_graph
+
+    cg = get_compact_graph("car")
+    cg.length_matrix()
+    cg.length_matrix(reverse=True)
+    cg.node_kdtree()
+    get_flood_edge_mask("car")
+    get_contraction_hierarchy("car", "base")
+    get_contraction_hierarchy("car", "flood")
+
+
+def preload_static_data():
+    """
+    Build every piece of static data the controllers use, so that when called in the
+    gunicorn master before fork the workers inherit it copy-on-write instead of
+    rebuilding it. Ends with gc.freeze() so the collector never writes to the
+    headers of these objects (which would un-share their pages in every worker).
+    """
+    start = time.perf_counter()
+
+    # Importing the controllers loads the module-level tables (stops_gdf, shapes_df)
+    import src.controllers.bus_controller  # noqa: F401
+    import src.controllers.car_trips_controller  # noqa: F401
+    import src.controllers.flood_events_controller  # noqa: F401
+    from src.controllers import critical_road_controller
+    from src.utils.centrality import get_projected_edges
+    from src.utils.flood_edge_index import get_flood_edge_index
+    from src.utils.flood_exposure import get_flood_exposure
+    from src.utils.flood_table import get_flood_table
+    from src.utils.graph_registry import get_compact_graph
+
+    # Spatial indexes for snapping points to car nodes and bus edges
+    get_compact_graph("car").node_kdtree()
+    get_compact_graph("bus").edge_strtree()
+    get_flood_table()
+    get_flood_exposure("car")
+    get_flood_edge_index("bus")
+    # Car routes only need the compact graph; the NetworkX one is loaded on demand (astar engines)
+    warm_route_data()
+    critical_road_controller._ensure_edges_loaded()
+    get_projected_edges("bus", ())
+    for metric in ("betweenness", "closeness"):
+        try:
+            critical_road_controller._load_metric(metric)
+            get_projected_edges("bus", (metric,))
+        except FileNotFoundError:
+            print(f"Preload: centrality file for '{metric}' not found, skipping")
+    try:
+        critical_road_controller._road_name_index()
+    except FileNotFoundError:
+        pass
+
+    gc.collect()
+    gc.freeze()
+    print(f"Preloaded static data in {time.perf_counter() - start:.1f}s "
+          f"({gc.get_freeze_count()} objects frozen)")
+
+
+def memory_report():
+    """
+    Shared vs private memory of the current process in MB, from /proc/self/smaps_rollup (Linux).
+    Returns None where the kernel does not provide it.
+    """
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except OSError:
+        return None
+
+    def mb(*names):
+        return round(sum(fields.get(n, 0) for n in names) / 1024, 1)
+
+    return {
+        "pid": os.getpid(),
+        "rss_mb": mb("Rss"),
+        "pss_mb": mb("Pss"),
+        "shared_mb": mb("Shared_Clean", "Shared_Dirty"),
+        "private_mb": mb("Private_Clean", "Private_Dirty"),
+        "gc_frozen_objects": gc.get_freeze_count(),
+    }
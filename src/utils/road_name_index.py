@@ -0,0 +1,98 @@
+"""
+Road-name search over the edges of the road network.
+
+Searching by name used to casefold and substring-match the name of every edge on every
+request. RoadNameIndex is built once from the edge names and a ranking of the edges:
+
+    exact map      casefolded name -> its edge rows, best-ranked first
+    n-gram index   every substring of up to NGRAM characters -> ids of the names containing it
+
+A substring query intersects the posting lists of its n-grams (shortest first), checks the
+few candidate names left, and merges their edge rows by rank. The cost depends on how many
+names and edges match, not on the size of the network.
+"""
+from collections import defaultdict
+
+import numpy as np
+
+NGRAM = 3
+
+_NO_IDS = np.zeros(0, dtype=np.int64)
+
+
+def normalize_road_name(name) -> str:
+    return str(name).casefold()
+
+
+class RoadNameIndex:
+    def __init__(self, names, ranks):
+        """names: road name per edge row; ranks: place of each row in the ranking (0 = best)."""
+        self.ranks = np.asarray(ranks)
+        rows_by_key = defaultdict(list)
+        spelling = {}
+        for row, name in enumerate(names):
+            key = normalize_road_name(name)
+            rows_by_key[key].append(row)
+            spelling.setdefault(key, str(name))
+
+        self.keys = sorted(rows_by_key)
+        self._ids = {key: i for i, key in enumerate(self.keys)}
+        self._names = [spelling[key] for key in self.keys]
+        self._rows = []
+        for key in self.keys:
+            rows = np.asarray(rows_by_key[key], dtype=np.int64)
+            self._rows.append(rows[np.argsort(self.ranks[rows], kind="stable")])
+        self._best_rank = np.array([self.ranks[rows[0]] for rows in self._rows], dtype=np.int64)
+
+        grams = defaultdict(set)
+        for i, key in enumerate(self.keys):
+            for n in range(1, NGRAM + 1):
+                for j in range(len(key) - n + 1):
+                    grams[key[j:j + n]].add(i)
+        self._grams = {gram: np.array(sorted(ids), dtype=np.int64) for gram, ids in grams.items()}
+
+    def name_ids(self, query, match="contains"):
+        """Ids of the names equal to (match="exact") or containing the query, case-insensitively."""
+        q = normalize_road_name(query)
+        if match == "exact":
+            i = self._ids.get(q)
+            return _NO_IDS if i is None else np.array([i], dtype=np.int64)
+        if not q:
+            return np.arange(len(self.keys), dtype=np.int64)
+        if len(q) <= NGRAM:
+            return self._grams.get(q, _NO_IDS)
+
+        postings = sorted(
+            (self._grams.get(q[j:j + NGRAM], _NO_IDS) for j in range(len(q) - NGRAM + 1)), key=len
+        )
+        ids = postings[0]
+        for posting in postings[1:]:
+            if not len(ids):
+                break
+            ids = np.intersect1d(ids, posting, assume_unique=True)
+        # Every n-gram present does not mean the whole query is
+        return np.array([i for i in ids.tolist() if q in self.keys[i]], dtype=np.int64)
+
+    def rows(self, query, match="contains"):
+        """Edge rows whose name matches the query, best-ranked first."""
+        ids = self.name_ids(query, match)
+        if len(ids) == 0:
+            return _NO_IDS
+        if len(ids) == 1:
+            return self._rows[ids[0]]
+        rows = np.concatenate([self._rows[i] for i in ids.tolist()])
+        return rows[np.argsort(self.ranks[rows], kind="stable")]
+
+    def suggest(self, query, limit=10, exclude=()):
+        """
+        [(name, rows)] for up to limit names containing the query: names starting with it
+        first, then by their best-ranked edge. Names in exclude are skipped.
+        """
+        q = normalize_road_name(query)
+        skip = {self._ids[key] for key in map(normalize_road_name, exclude) if key in self._ids}
+        ids = np.array([i for i in self.name_ids(q).tolist() if i not in skip], dtype=np.int64)
+        if len(ids) == 0:
+            return []
+        prefix = np.array([self.keys[i].startswith(q) for i in ids.tolist()])
+        ids = ids[np.lexsort((self._best_rank[ids], ~prefix))][:limit]
+        return [(self._names[i], self._rows[i]) for i in ids.tolist()]
@@ -0,0 +1,59 @@
+"""
+Cache of computed car routes.
+
+Popular trips (e.g. into the CBD) snap to the same pair of graph nodes, so the full
+/car_route result is kept per (origin node, destination node, engine, speed profile) and
+tagged with the flood dataset version and the car GraphML's size and mtime: when
+flood_events_rows.csv or the graph changes, every cached route is dropped, since its
+nodes, flooded segments and detour may no longer hold.
+
+    ROUTE_CACHE_SIZE   routes kept per process (default 2048, 0 disables the cache)
+    ROUTE_CACHE_TTL_S  seconds a route is served from the cache (default 6 hours)
+    ROUTE_CACHE_DB     SQLite file shared by all workers (default: memory only)
+"""
+import os
+
+from src.utils.flood_exposure import flood_dataset_version
+from src.utils.graph_registry import graph_source_stamp
+from src.utils.shared_cache import SharedLRUCache
+from src.utils.travel_time import SPEED_PROFILE
+
+ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", "2048"))
+ROUTE_CACHE_TTL_S = float(os.getenv("ROUTE_CACHE_TTL_S", str(6 * 3600)))
+ROUTE_CACHE_DB = os.getenv("ROUTE_CACHE_DB") or None
+
+_CACHE = None
+
+
+def get_route_cache():
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = SharedLRUCache("car_route", ROUTE_CACHE_SIZE, ROUTE_CACHE_TTL_S, ROUTE_CACHE_DB)
+    return _CACHE
+
+
+def route_cache_key(orig_node, dest_node, engine):
+    return f"{orig_node}:{dest_node}:{engine}:{SPEED_PROFILE}"
+
+
+def route_cache_version(flood_version=None):
+    """Version cached routes are tagged with: the flood data version and the car graph source."""
+    return f"{flood_version or flood_dataset_version()}:{graph_source_stamp('car')}"
+
+
+def cached_route(orig_node, dest_node, engine, flood_version=None):
+    """Cached /car_route result between two nodes for the flood data and graph version, or None."""
+    if ROUTE_CACHE_SIZE <= 0:
+        return None
+    return get_route_cache().get(route_cache_key(orig_node, dest_node, engine), route_cache_version(flood_version))
+
+
+def cache_route(orig_node, dest_node, engine, result, flood_version=None):
+    if ROUTE_CACHE_SIZE > 0:
+        get_route_cache().put(
+            route_cache_key(orig_node, dest_node, engine), result, route_cache_version(flood_version)
+        )
+
+
+def route_cache_stats():
+    return {"enabled": ROUTE_CACHE_SIZE > 0, **get_route_cache().stats()}
@@ -0,0 +1,251 @@
+"""
+Process pool for CPU-bound route computations.
+
+Route searches hold the GIL, so running them in the Flask request thread stalls every
+other request handled by the same worker. Jobs submitted here run in separate processes
+instead, and the request thread just waits on the result (without holding the GIL).
+
+The pool is forked after warm_up() has loaded the graphs, so the route processes inherit
+them copy-on-write. Under gunicorn each worker forks its pool from the post_fork hook
+(start_route_pool), before it starts any threads; elsewhere the pool is forked on the first
+job. Pool processes reset the signal handlers they inherit (gunicorn's master queues
+SIGTERM instead of exiting). A job that runs past its timeout is stopped by killing the
+pool's processes (SIGKILL), and a fresh pool is forked for the next job.
+
+That replacement pool is forked from the request thread of the next job, in a process that
+already runs other threads: the child only gets the forking thread, and any lock another
+thread held at that moment (in Python or a C library) stays locked there. Route jobs only
+run NumPy/SciPy searches on the preloaded graphs, but set ROUTE_WORKERS=0 to rule it out.
+
+    ROUTE_WORKERS      processes in the pool (0 runs jobs inline, default 2)
+    ROUTE_TIMEOUT_S    seconds a request waits for its job (default 30)
+    ROUTE_MAX_PENDING  jobs queued or running before new ones are rejected (default 4 per worker)
+"""
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+ROUTE_WORKERS = int(os.getenv("ROUTE_WORKERS", "2"))
+ROUTE_TIMEOUT_S = float(os.getenv("ROUTE_TIMEOUT_S", "30"))
+ROUTE_MAX_PENDING = int(os.getenv("ROUTE_MAX_PENDING", str(max(ROUTE_WORKERS, 1) * 4)))
+
+
+class RouteQueueFull(Exception):
+    """Too many route jobs are already queued or running."""
+
+
+class RouteTimeout(Exception):
+    """A route job did not finish within its timeout."""
+
+
+_POOL = None
+_POOL_PID = None
+# Re-entrant: cancelling futures on shutdown runs _job_done in the same thread
+_LOCK = threading.RLock()
+_IN_FLIGHT = 0
+_METRICS = {
+    "submitted": 0, "completed": 0, "failed": 0, "timed_out": 0, "cancelled": 0,
+    "rejected": 0, "retried": 0, "killed": 0, "pool_restarts": 0,
+}
+_LATENCY_MS = []
+_LATENCY_WINDOW = 500
+# gunicorn's master handles these in Python; a pool forked in post_fork inherits those handlers
+_RESET_SIGNALS = ("SIGTERM", "SIGINT", "SIGQUIT", "SIGHUP", "SIGCHLD", "SIGUSR1", "SIGUSR2", "SIGWINCH")
+
+
+def _init_route_process():
+    """Pool process initializer: default signal handling, so terminate() and Ctrl-C stop it."""
+    signal.set_wakeup_fd(-1)
+    for name in _RESET_SIGNALS:
+        signum = getattr(signal, name, None)
+        if signum is not None:
+            signal.signal(signum, signal.SIG_DFL)
+
+
+def _get_pool(warm_up=None):
+    global _POOL, _POOL_PID
+    with _LOCK:
+        if _POOL is not None and _POOL_PID == os.getpid():
+            return _POOL
+        if warm_up is not None:
+            warm_up()
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        pool = ProcessPoolExecutor(max_workers=ROUTE_WORKERS, mp_context=context, initializer=_init_route_process)
+        # With fork the executor starts all its processes on the first submit; do it now
+        pool.submit(int).result()
+        _POOL, _POOL_PID = pool, os.getpid()
+        print(f"Started route worker pool: {ROUTE_WORKERS} processes (pid {_POOL_PID})")
+        return _POOL
+
+
+def start_route_pool(warm_up=None):
+    """
+    Fork the route pool of this process now, after warm_up(), rather than on the first job.
+    Called from gunicorn's post_fork hook while the worker is still single-threaded.
+    """
+    if ROUTE_WORKERS > 0:
+        _get_pool(warm_up)
+
+
+def _discard_pool(pool, kill=False):
+    """Drop pool (if it is still the current one) so the next job starts a fresh one; kill=True kills its processes."""
+    global _POOL
+    with _LOCK:
+        if _POOL is not pool:
+            return
+        _POOL = None
+        _METRICS["pool_restarts"] += 1
+        if kill:
+            _METRICS["killed"] += 1
+            for process in list(pool._processes.values()):
+                process.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _job_done(future):
+    global _IN_FLIGHT
+    with _LOCK:
+        _IN_FLIGHT -= 1
+        if future.cancelled():
+            _METRICS["cancelled"] += 1
+
+
+def _admit(n_jobs):
+    """Count n_jobs as in flight, or raise RouteQueueFull if that would exceed ROUTE_MAX_PENDING."""
+    global _IN_FLIGHT
+    with _LOCK:
+        if _IN_FLIGHT + n_jobs > ROUTE_MAX_PENDING:
+            _METRICS["rejected"] += 1
+            raise RouteQueueFull(f"{_IN_FLIGHT} route jobs already in flight (limit {ROUTE_MAX_PENDING})")
+        _IN_FLIGHT += n_jobs
+        _METRICS["submitted"] += n_jobs
+
+
+def _release(n_jobs):
+    global _IN_FLIGHT
+    with _LOCK:
+        _IN_FLIGHT -= n_jobs
+
+
+def _count(metric, n=1):
+    with _LOCK:
+        _METRICS[metric] += n
+
+
+def _submit(pool, fn, args):
+    future = pool.submit(fn, *args)
+    # In-flight counts the job until its process is actually free again
+    future.add_done_callback(_job_done)
+    return future
+
+
+def run_route_jobs(fn, arg_lists, timeout=None, warm_up=None):
+    """
+    Run fn(*args) for every args in arg_lists in the route pool, concurrently, and return
+    the results in order. The jobs are admitted together or not at all.
+
+    Raises RouteQueueFull when they would take the jobs in flight past ROUTE_MAX_PENDING and
+    RouteTimeout when they do not all finish within timeout; jobs still queued are then
+    cancelled and, if one is already running, the pool's processes are killed and a fresh
+    pool is started. A job whose process died (e.g. killed with another job, or for memory)
+    is run once more. Any exception from a job is re-raised. fn and its arguments must be
+    picklable.
+    """
+    arg_lists = [tuple(args) for args in arg_lists]
+    timeout = ROUTE_TIMEOUT_S if timeout is None else timeout
+    start = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    _admit(len(arg_lists))
+
+    if ROUTE_WORKERS <= 0:
+        try:
+            results = [fn(*args) for args in arg_lists]
+        except Exception:
+            _count("failed")
+            raise
+        finally:
+            _release(len(arg_lists))
+    else:
+        results = _run_in_pool(fn, arg_lists, deadline, timeout, warm_up)
+
+    with _LOCK:
+        _METRICS["completed"] += len(arg_lists)
+        _LATENCY_MS.append((time.perf_counter() - start) * 1000)
+        del _LATENCY_MS[:-_LATENCY_WINDOW]
+    return results
+
+
+def _run_in_pool(fn, arg_lists, deadline, timeout, warm_up):
+    futures = []
+    try:
+        pool = _get_pool(warm_up)
+        for args in arg_lists:
+            futures.append(_submit(pool, fn, args))
+    except Exception:
+        _release(len(arg_lists) - len(futures))
+        for future in futures:
+            future.cancel()
+        raise
+
+    results = []
+    try:
+        for i, (args, future) in enumerate(zip(arg_lists, futures)):
+            try:
+                results.append(future.result(timeout=max(deadline - time.monotonic(), 0)))
+            except BrokenProcessPool:
+                # Its process died: start a fresh pool and run the job once more
+                _discard_pool(pool)
+                _admit(1)
+                _count("retried")
+                try:
+                    pool = _get_pool(warm_up)
+                    futures[i] = future = _submit(pool, fn, args)
+                except Exception:
+                    _release(1)
+                    raise
+                results.append(future.result(timeout=max(deadline - time.monotonic(), 0)))
+    except FutureTimeoutError:
+        running = [future for future in futures if not future.cancel() and not future.done()]
+        if running:
+            # A job that has started cannot be cancelled; only killing its process stops it
+            _discard_pool(pool, kill=True)
+        _count("timed_out")
+        raise RouteTimeout(f"Route job did not finish within {timeout:g}s")
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        _count("failed")
+        raise
+    except Exception:
+        for future in futures:
+            future.cancel()
+        _count("failed")
+        raise
+    return results
+
+
+def run_route_job(fn, *args, timeout=None, warm_up=None):
+    """Run fn(*args) in the route pool and return its result (see run_route_jobs)."""
+    return run_route_jobs(fn, [args], timeout=timeout, warm_up=warm_up)[0]
+
+
+def route_worker_metrics():
+    """Pool size, queue depth and job counters of this process's route pool."""
+    with _LOCK:
+        latencies = sorted(_LATENCY_MS)
+        return {
+            "pid": os.getpid(),
+            "workers": ROUTE_WORKERS,
+            "pool_started": _POOL is not None and _POOL_PID == os.getpid(),
+            "in_flight": _IN_FLIGHT,
+            "max_pending": ROUTE_MAX_PENDING,
+            "timeout_s": ROUTE_TIMEOUT_S,
+            **_METRICS,
+            "latency_ms_p50": round(latencies[len(latencies) // 2], 2) if latencies else None,
+            "latency_ms_p95": round(latencies[int(len(latencies) * 0.95)], 2) if latencies else None,
+        }
@@ -0,0 +1,320 @@
+"""
+Shortest-path engines for the road networks.
+
+- "dijkstra":            NetworkX Dijkstra (the original behaviour)
+- "astar":               NetworkX A* with a great-circle heuristic
+- "bidirectional_astar": bidirectional A* with the same heuristic, using the average
+                         potential of the forward and backward searches
+
+The heuristic is the haversine distance between node x/y (lon/lat), which never exceeds
+the length of an edge in metres, so both A* variants return shortest paths.
+
+reverse_dijkstra() / incremental_detour() run on a CompactGraph and let a penalised search
+(the flood detour) reuse the distance labels of the unpenalised one instead of starting
+again from scratch.
+Compare them on random OD pairs with:
+    python -m src.utils.routing 200
+"""
+import math
+import random
+import sys
+import time
+from heapq import heappop, heappush
+from itertools import count
+
+import networkx as nx
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+ENGINES = ("dijkstra", "astar", "bidirectional_astar")
+EARTH_RADIUS_M = 6_371_009
+
+
+def haversine_m(lon1, lat1, lon2, lat2):
+    """Great-circle distance in metres between two lon/lat points."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _weight_function(G, weight):
+    """Same convention as NetworkX: a callable (u, v, data) or an edge attribute name."""
+    if callable(weight):
+        return weight
+    if G.is_multigraph():
+        return lambda u, v, edges: min(data.get(weight, 1) for data in edges.values())
+    return lambda u, v, data: data.get(weight, 1)
+
+
+def _great_circle_heuristic(G, target):
+    nodes = G.nodes
+    tx, ty = nodes[target]["x"], nodes[target]["y"]
+
+    def heuristic(n, _target=None):
+        return haversine_m(nodes[n]["x"], nodes[n]["y"], tx, ty)
+    return heuristic
+
+
+def bidirectional_astar_path(G, orig, dest, weight="length", stats=None):
+    """
+    Bidirectional A* between orig and dest. Both searches run on edge costs reduced by the
+    average potential p(v) = (h(v, dest) - h(orig, v)) / 2, which keeps them consistent
+    with each other so the usual bidirectional Dijkstra stopping rule applies.
+    """
+    if orig == dest:
+        return [orig]
+
+    weight_fn = _weight_function(G, weight)
+    nodes = G.nodes
+    sx, sy = nodes[orig]["x"], nodes[orig]["y"]
+    tx, ty = nodes[dest]["x"], nodes[dest]["y"]
+    potentials = {}
+
+    def potential(n):
+        p = potentials.get(n)
+        if p is None:
+            x, y = nodes[n]["x"], nodes[n]["y"]
+            p = (haversine_m(x, y, tx, ty) - haversine_m(sx, sy, x, y)) / 2
+            potentials[n] = p
+        return p
+
+    # Index 0 = forward search from orig, 1 = backward search from dest
+    neighbours = (G._succ, G._pred)
+    dist = ({orig: 0.0}, {dest: 0.0})
+    pred = ({orig: None}, {dest: None})
+    settled = (set(), set())
+    offset = (potential(orig), -potential(dest))
+    heaps = ([(0.0, 0, orig)], [(0.0, 0, dest)])
+    tie = count(1)
+
+    best = math.inf
+    meeting = None
+    # Reduced keys of a meeting node sum to the real length plus this constant
+    key_offset = potential(orig) - potential(dest)
+
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best - key_offset:
+            break
+
+        side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+        _, _, u = heappop(heaps[side])
+        if u in settled[side]:
+            continue
+        settled[side].add(u)
+
+        d_u = dist[side][u]
+        for w, edges in neighbours[side][u].items():
+            cost = weight_fn(u, w, edges) if side == 0 else weight_fn(w, u, edges)
+            if cost is None:
+                continue
+            d_w = d_u + cost
+            if d_w < dist[side].get(w, math.inf):
+                dist[side][w] = d_w
+                pred[side][w] = u
+                p_w = potential(w) if side == 0 else -potential(w)
+                heappush(heaps[side], (d_w + p_w - offset[side], next(tie), w))
+            other = dist[1 - side].get(w)
+            if other is not None and d_w + other < best:
+                best = d_w + other
+                meeting = w
+
+    if stats is not None:
+        stats["settled"] = len(settled[0]) + len(settled[1])
+    if meeting is None:
+        raise nx.NetworkXNoPath(f"No path between {orig} and {dest}.")
+
+    path = []
+    n = meeting
+    while n is not None:
+        path.append(n)
+        n = pred[0][n]
+    path.reverse()
+    n = pred[1][meeting]
+    while n is not None:
+        path.append(n)
+        n = pred[1][n]
+    return path
+
+
+def shortest_path(G, orig, dest, weight="length", engine="dijkstra", stats=None):
+    """
+    Node path from orig to dest using the selected engine (see ENGINES).
+    If a stats dict is given, engines that can count them record the nodes settled.
+    """
+    if engine == "dijkstra":
+        return nx.shortest_path(G, orig, dest, weight=weight)
+    if engine == "astar":
+        return nx.astar_path(G, orig, dest, heuristic=_great_circle_heuristic(G, dest), weight=weight)
+    if engine == "bidirectional_astar":
+        return bidirectional_astar_path(G, orig, dest, weight=weight, stats=stats)
+    raise ValueError(f"engine must be one of: {', '.join(ENGINES)}")
+
+
+def reverse_dijkstra(cg, orig, dest, weights=None):
+    """
+    Distance from every node of a CompactGraph to dest, in one scipy Dijkstra over the
+    reversed graph. `weights` is a per-edge array (default: edge lengths).
+    Returns a search tree {"orig", "dest", "dist", "next_hop", "settled"} over dense node
+    indices: the exact distance to dest and the next node on the way there for every node.
+    """
+    orig_idx, dest_idx = cg.node_index([orig, dest]).tolist()
+    matrix = cg.length_matrix(reverse=True) if weights is None else cg.weight_matrix(weights).T.tocsr()
+    dist, next_hop = dijkstra(matrix, indices=dest_idx, return_predecessors=True)
+    if not np.isfinite(dist[orig_idx]):
+        raise nx.NetworkXNoPath(f"No path between {orig} and {dest}.")
+    return {
+        "orig": orig_idx, "dest": dest_idx, "dist": dist, "next_hop": next_hop,
+        "settled": int(np.isfinite(dist).sum()),
+    }
+
+
+def one_to_many(cg, orig, dests, weights=None):
+    """
+    Shortest paths from orig to each of dests (OSM node ids) with one scipy Dijkstra.
+    Returns {dest: [OSM node path]} with None for unreachable destinations.
+    """
+    orig_idx = int(cg.node_index([orig])[0])
+    matrix = cg.length_matrix() if weights is None else cg.weight_matrix(weights)
+    dist, predecessors = dijkstra(matrix, indices=orig_idx, return_predecessors=True)
+    paths = {}
+    for dest, dest_idx in zip(dests, cg.node_index(dests).tolist()):
+        if not np.isfinite(dist[dest_idx]):
+            paths[dest] = None
+            continue
+        path = [dest_idx]
+        while path[-1] != orig_idx:
+            path.append(int(predecessors[path[-1]]))
+        paths[dest] = cg.node_ids[path[::-1]].tolist()
+    return paths
+
+
+def tree_path(cg, tree, node=None):
+    """OSM node path from a node (default: the tree's orig) to the dest of a reverse_dijkstra tree."""
+    next_hop = tree["next_hop"]
+    path = [tree["orig"] if node is None else node]
+    while path[-1] != tree["dest"]:
+        path.append(int(next_hop[path[-1]]))
+    return cg.node_ids[path].tolist()
+
+
+def incremental_detour(cg, tree, weights, stats=None):
+    """
+    Shortest orig->dest path under per-edge `weights` that are never below the edge lengths
+    (e.g. flooded edges penalised), reusing the distance labels of a reverse_dijkstra tree.
+
+    A* runs from orig with the tree distances as a consistent lower bound. As soon as it
+    settles a node whose tree path to dest has no re-weighted edge, the bound is exact there
+    and the rest of the path is taken from the tree, so only the region around the penalised
+    edges is searched again.
+    """
+    weights = list(weights)
+    base = cg.search_lists()[2]
+    orig, dest = tree["orig"], tree["dest"]
+    dist = tree["dist"].tolist()
+    next_hop = tree["next_hop"].tolist()
+
+    def cheapest(u, w, edge_weights):
+        targets, edges = cg.out_edges(u)
+        return min(edge_weights[e] for t, e in zip(targets, edges) if t == w)
+
+    # unchanged[x]: the tree path from x to dest costs the same under both weights
+    unchanged = {dest: True}
+
+    def is_unchanged(x):
+        chain = []
+        while x not in unchanged:
+            chain.append(x)
+            x = next_hop[x]
+        ok = unchanged[x]
+        for y in reversed(chain):
+            ok = ok and cheapest(y, next_hop[y], weights) == cheapest(y, next_hop[y], base)
+            unchanged[y] = ok
+        return ok
+
+    g = {orig: 0.0}
+    pred = {orig: None}
+    closed = set()
+    heap = [(dist[orig], 0, orig)]
+    tie = count(1)
+    while heap:
+        _, _, u = heappop(heap)
+        if u in closed:
+            continue
+        closed.add(u)
+        if is_unchanged(u):
+            path = []
+            n = u
+            while n is not None:
+                path.append(n)
+                n = pred[n]
+            path.reverse()
+            if stats is not None:
+                stats["settled"] = len(closed)
+                stats["reused_labels"] = tree["settled"]
+            return cg.node_ids[path].tolist() + tree_path(cg, tree, u)[1:]
+
+        g_u = g[u]
+        targets, edges = cg.out_edges(u)
+        for w, e in zip(targets, edges):
+            if w in closed or dist[w] == math.inf:
+                continue
+            g_w = g_u + weights[e]
+            if g_w < g.get(w, math.inf):
+                g[w] = g_w
+                pred[w] = u
+                heappush(heap, (g_w + dist[w], next(tie), w))
+
+    raise nx.NetworkXNoPath(f"No path between {cg.node_ids[orig]} and {cg.node_ids[dest]}.")
+
+
+def path_weight(G, path, weight="length"):
+    weight_fn = _weight_function(G, weight)
+    return sum(weight_fn(u, v, G._succ[u][v]) for u, v in zip(path[:-1], path[1:]))
+
+
+def benchmark_engines(G, od_pairs, weight="length", engines=ENGINES):
+    """
+    Time every engine on the same OD pairs. Returns per-engine latency stats in ms and the
+    number of pairs whose path length differs from Dijkstra (should be 0).
+    """
+    results = {}
+    reference = {}
+    for engine in engines:
+        timings = []
+        mismatches = 0
+        for orig, dest in od_pairs:
+            start = time.perf_counter()
+            path = shortest_path(G, orig, dest, weight=weight, engine=engine)
+            timings.append((time.perf_counter() - start) * 1000)
+            length = path_weight(G, path, weight)
+            if (orig, dest) not in reference:
+                reference[(orig, dest)] = length
+            elif not math.isclose(length, reference[(orig, dest)], rel_tol=1e-9, abs_tol=1e-6):
+                mismatches += 1
+        timings = np.array(timings)
+        results[engine] = {
+            "pairs": len(timings),
+            "mean_ms": round(float(timings.mean()), 2),
+            "p50_ms": round(float(np.percentile(timings, 50)), 2),
+            "p95_ms": round(float(np.percentile(timings, 95)), 2),
+            "length_mismatches": mismatches,
+        }
+    return results
+
+
+def random_od_pairs(G, n, seed=42):
+    """n random origin/destination pairs from the largest strongly connected component."""
+    component = list(max(nx.strongly_connected_components(G), key=len))
+    rng = random.Random(seed)
+    return [tuple(rng.sample(component, 2)) for _ in range(n)]
+
+
+if __name__ == "__main__":
+    from src.utils.graph_registry import get_graph
+
+    n_pairs = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    G = get_graph("car")
+    for engine, stats in benchmark_engines(G, random_od_pairs(G, n_pairs)).items():
+        print(f"{engine:>20}: {stats}")
@@ -0,0 +1,160 @@
+"""
+Bounded LRU cache with a time-to-live, optionally backed by SQLite.
+
+Each process keeps the most recently used entries in memory. With a db_path the entries
+are also written to a SQLite table, so the other gunicorn workers (and a restarted
+process) find what any of them computed. Values must be JSON-serialisable.
+
+Every entry carries a "version" (e.g. the flood dataset version). When a different
+version is seen, entries of the old one are dropped from memory and from the table.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Delete expired and excess rows from SQLite every this many writes
+_PRUNE_EVERY = 100
+
+
+class SharedLRUCache:
+    def __init__(self, name, max_entries=1024, ttl_s=3600.0, db_path=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.db_path = str(db_path) if db_path else None
+        self._entries = OrderedDict()  # key -> (stored at, value)
+        self._version = None
+        self._lock = threading.RLock()
+        self._db = None
+        self._db_pid = None
+        self._writes = 0
+        self._counters = {"hits": 0, "store_hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    # ---- SQLite store ----
+
+    def _connection(self):
+        """Connection of this process (a connection must not be used across a fork)."""
+        if self.db_path is None:
+            return None
+        if self._db is None or self._db_pid != os.getpid():
+            db = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.name} ("
+                "key TEXT PRIMARY KEY, version TEXT, stored_at REAL, used_at REAL, value TEXT)"
+            )
+            db.execute(f"CREATE INDEX IF NOT EXISTS {self.name}_used ON {self.name} (used_at)")
+            db.commit()
+            self._db, self._db_pid = db, os.getpid()
+        return self._db
+
+    def _store_call(self, fn):
+        """Run fn(connection); a failing store is reported and then ignored."""
+        try:
+            db = self._connection()
+            return fn(db) if db is not None else None
+        except sqlite3.Error as e:
+            print(f"Warning: {self.name} cache store {self.db_path} failed: {e}")
+            return None
+
+    def _store_get(self, key, version, now):
+        row = self._store_call(lambda db: db.execute(
+            f"SELECT stored_at, value FROM {self.name} WHERE key = ? AND version = ? AND stored_at > ?",
+            (key, version, now - self.ttl_s),
+        ).fetchone())
+        if row is None:
+            return None
+        self._store_call(lambda db: (
+            db.execute(f"UPDATE {self.name} SET used_at = ? WHERE key = ?", (now, key)), db.commit()
+        ))
+        return row[0], json.loads(row[1])
+
+    def _store_put(self, key, version, value, now):
+        def put(db):
+            db.execute(
+                f"INSERT OR REPLACE INTO {self.name} VALUES (?, ?, ?, ?, ?)",
+                (key, version, now, now, json.dumps(value)),
+            )
+            self._writes += 1
+            if self._writes % _PRUNE_EVERY == 0:
+                db.execute(f"DELETE FROM {self.name} WHERE stored_at <= ?", (now - self.ttl_s,))
+                db.execute(
+                    f"DELETE FROM {self.name} WHERE key IN (SELECT key FROM {self.name} "
+                    "ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            db.commit()
+        self._store_call(put)
+
+    # ---- cache ----
+
+    def _check_version(self, version):
+        if version == self._version:
+            return
+        if self._version is not None:
+            self._counters["invalidations"] += 1
+            print(f"{self.name} cache: version changed {self._version} -> {version}, dropping old entries")
+        self._entries.clear()
+        self._store_call(lambda db: (
+            db.execute(f"DELETE FROM {self.name} WHERE version != ?", (version,)), db.commit()
+        ))
+        self._version = version
+
+    def _remember(self, key, stored_at, value):
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def get(self, key, version=""):
+        """Cached value for key under version, or None."""
+        now = time.time()
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] < self.ttl_s:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return entry[1]
+                del self._entries[key]
+                self._counters["expired"] += 1
+
+            entry = self._store_get(key, version, now)
+            if entry is not None:
+                self._remember(key, *entry)
+                self._counters["store_hits"] += 1
+                return entry[1]
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, key, value, version=""):
+        now = time.time()
+        with self._lock:
+            self._check_version(version)
+            self._remember(key, now, value)
+            self._store_put(key, version, value, now)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._store_call(lambda db: (db.execute(f"DELETE FROM {self.name}"), db.commit()))
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["store_hits"] + self._counters["misses"]
+            hits = self._counters["hits"] + self._counters["store_hits"]
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "store": self.db_path,
+                "version": self._version,
+                **self._counters,
+                "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            }
@@ -0,0 +1,62 @@
+"""
+Travel-time and flood-delay model for car routes.
+
+Each edge is timed at every speed in SPEEDS_KPH; on a flooded edge the delay at a speed is
+the extra time over driving it at NORMAL_SPEED. Everything is computed on arrays of edge
+lengths (edges x speeds) so a route costs a few NumPy operations however long it is.
+"""
+import numpy as np
+
+SPEEDS_KPH = {
+    "5kph": 5, "10kph": 10, "20kph": 20,
+    "45kph": 45, "72kph": 72, "81kph": 81,
+    "90kph": 90,  # baseline
+}
+NORMAL_SPEED = "90kph"
+
+SPEED_LABELS = tuple(SPEEDS_KPH)
+SPEEDS_MPS = np.array([kph * 1000 / 3600 for kph in SPEEDS_KPH.values()])
+_NORMAL_COLUMN = SPEED_LABELS.index(NORMAL_SPEED)
+# Identifies the speeds above, e.g. in cache keys of results computed with them
+SPEED_PROFILE = ",".join(map(str, SPEEDS_KPH.values())) + f"/{NORMAL_SPEED}"
+
+
+def edge_travel_times(lengths):
+    """Seconds to drive each edge at each speed, shape (edges, speeds)."""
+    return np.asarray(lengths, dtype=np.float64)[:, None] / SPEEDS_MPS
+
+
+def route_delays(lengths, flooded):
+    """
+    Delay model for one route given its edge lengths (m) and a boolean flooded mask.
+    Returns arrays: per-edge "edge_times" and "edge_delays" (edges, speeds), and per-speed
+    "normal_time" (whole route) and "total_delay" (sum over flooded edges).
+    """
+    lengths = np.asarray(lengths, dtype=np.float64)
+    times = edge_travel_times(lengths)
+    delays = times - times[:, [_NORMAL_COLUMN]]
+    return {
+        "edge_times": times,
+        "edge_delays": delays,
+        "normal_time": lengths.sum() / SPEEDS_MPS,
+        "total_delay": delays[np.asarray(flooded, dtype=bool)].sum(axis=0),
+    }
+
+
+def by_speed(values):
+    """{speed label: value} for a per-speed array."""
+    return dict(zip(SPEED_LABELS, np.asarray(values, dtype=np.float64).tolist()))
+
+
+def flood_travel_times(length_m, flooded_length_m, speed):
+    """
+    Normal time, flooded time and delay (seconds) for arrays of route length and flooded
+    length, with the flooded part driven at `speed` (a SPEEDS_KPH label) instead of NORMAL_SPEED.
+    """
+    normal_mps = SPEEDS_MPS[_NORMAL_COLUMN]
+    flood_mps = SPEEDS_MPS[SPEED_LABELS.index(speed)]
+    length_m = np.asarray(length_m, dtype=np.float64)
+    flooded_length_m = np.asarray(flooded_length_m, dtype=np.float64)
+    normal = length_m / normal_mps
+    delay = flooded_length_m / flood_mps - flooded_length_m / normal_mps
+    return normal, normal + delay, delay